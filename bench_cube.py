@@ -0,0 +1,137 @@
+import os, sys, json, time, platform, argparse
+
+# Render timings run without a window through SDL's dummy video driver; this
+# has to be set before pygame is imported.
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import numpy as np
+import pygame
+import rcube3d
+
+DEFAULT_SIZES = [2, 3, 4, 5, 8, 16, 32, 64, 128, 256]
+
+# Screen and camera used for the render timings (main()'s defaults).
+SCREEN_SIZE = (800, 600)
+FOV = 256
+VIEWER_DISTANCE = 4
+ROT_X, ROT_Y = 25, -30
+
+# Every move method of the Cube (both viewers share the rcube_core engine).
+CUBE_MOVES = [f"move_{m}{cc}" for m in "UDFBLRMES" for cc in ("", "_cc")]
+
+BACKENDS = {
+    'eager': (lambda n: rcube3d.Cube(n), CUBE_MOVES),
+    'lazy': (lambda n: rcube3d.Cube(n, lazy=True), CUBE_MOVES),
+}
+
+
+# Call fn until at least min_time has passed; returns (calls, seconds).
+def time_call(fn, min_time):
+    calls, start = 0, time.perf_counter()
+    while True:
+        fn()
+        calls += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            return calls, elapsed
+
+
+# Bytes held by an object graph: containers, arrays and their elements,
+# counting shared objects (such as interned sticker letters) once.
+def deep_sizeof(obj, seen=None):
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    if isinstance(obj, np.ndarray):
+        return sys.getsizeof(obj) + (obj.nbytes if obj.base is not None else 0)
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(k, seen) + deep_sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set)):
+        size += sum(deep_sizeof(v, seen) for v in obj)
+    elif hasattr(obj, '__dict__'):
+        size += deep_sizeof(vars(obj), seen)
+    return size
+
+
+def bench_moves(backend, n, min_time):
+    make, moves = BACKENDS[backend]
+    cube = make(n)
+    # Build cached permutations before timing.
+    for name in moves:
+        getattr(cube, name)()
+    results = []
+    for name in moves:
+        calls, elapsed = time_call(getattr(cube, name), min_time)
+        results.append({'kind': 'move', 'backend': backend, 'n': n, 'move': name,
+                        'calls': calls, 'seconds': elapsed, 'per_sec': calls / elapsed})
+    # Reading the faces settles any pending lazy rotations, as a viewer would.
+    cube.faces
+    results.append({'kind': 'memory', 'backend': backend, 'n': n,
+                    'bytes': deep_sizeof(cube)})
+    return results
+
+
+def bench_render(n, min_time):
+    cube = rcube3d.Cube(n)
+    cube.apply("R U F' L2 D B'")
+    surface = pygame.Surface(SCREEN_SIZE)
+    mesher = rcube3d.FaceMesher()
+    width, height = SCREEN_SIZE
+    polygons = rcube3d.accumulate_all_polygons(cube, ROT_X, ROT_Y, width, height, FOV, VIEWER_DISTANCE)
+
+    def build():
+        rcube3d.accumulate_all_polygons(cube, ROT_X, ROT_Y, width, height, FOV, VIEWER_DISTANCE)
+
+    def sort():
+        sorted(polygons, key=lambda poly: poly[0], reverse=True)
+
+    def draw():
+        surface.fill((50, 50, 50))
+        rcube3d.draw_cube(surface, cube, ROT_X, ROT_Y, FOV, VIEWER_DISTANCE, mesher)
+
+    results = []
+    for stage, fn in (('build', build), ('sort', sort), ('draw', draw)):
+        calls, elapsed = time_call(fn, min_time)
+        results.append({'kind': 'render', 'stage': stage, 'n': n, 'polygons': len(polygons),
+                        'calls': calls, 'seconds': elapsed, 'ms': 1000 * elapsed / calls})
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless cube benchmarks.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--backends', nargs='+', choices=sorted(BACKENDS), default=sorted(BACKENDS))
+    parser.add_argument('--min-time', type=float, default=0.05,
+                        help="minimum seconds spent timing each measurement")
+    parser.add_argument('--no-render', action='store_true', help="skip the render timings")
+    parser.add_argument('-o', '--output', default='bench_results.json')
+    args = parser.parse_args(argv)
+
+    pygame.init()
+    results = []
+    for n in args.sizes:
+        for backend in args.backends:
+            results.extend(bench_moves(backend, n, args.min_time))
+        if not args.no_render:
+            results.extend(bench_render(n, args.min_time))
+        print(f"n={n} done", file=sys.stderr)
+    pygame.quit()
+
+    report = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pygame': pygame.version.ver,
+        'platform': platform.platform(),
+        'min_time': args.min_time,
+        'results': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=1)
+    print(f"wrote {len(results)} results to {args.output}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+import json, time
+from collections import deque
+
+# --- Per-frame stage timing for the pygame loops ---
+# Usage per frame:
+#     profiler.start_frame()
+#     ...handle events...;  profiler.mark('events')
+#     ...build polygons...; profiler.mark('build')
+#     profiler.end_frame()
+# Each mark records the time since the previous mark under that stage name.
+# A disabled profiler returns immediately from every call, so the loops can
+# keep the calls in place at near-zero cost.  Timing is on with the overlay
+# or a trace; only overlay=True draws on screen, so a trace measures the
+# frames as they are drawn without it.
+class FrameProfiler:
+    def __init__(self, overlay=False, window=120, trace_path=None):
+        self.enabled = overlay or trace_path is not None
+        self.overlay = overlay
+        self.frame_times = deque(maxlen=window)
+        self.stages = {}
+        self.frame = 0
+        self._last = self._start = 0.0
+        self._font = None
+        # Per-frame traces go out as JSON lines.
+        self._trace = open(trace_path, 'w') if trace_path else None
+
+    def start_frame(self):
+        if not self.enabled:
+            return
+        self.stages = {}
+        self._last = self._start = time.perf_counter()
+
+    def mark(self, stage):
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self.stages[stage] = self.stages.get(stage, 0.0) + now - self._last
+        self._last = now
+
+    def end_frame(self):
+        if not self.enabled:
+            return
+        total = time.perf_counter() - self._start
+        self.frame_times.append(total)
+        if self._trace:
+            record = {'frame': self.frame, 't': self._start, 'total': total}
+            record.update(self.stages)
+            self._trace.write(json.dumps(record) + '\n')
+        self.frame += 1
+
+    # Rolling frame-time percentile in seconds (p in 0..100).
+    def percentile(self, p):
+        if not self.frame_times:
+            return 0.0
+        times = sorted(self.frame_times)
+        return times[min(len(times) - 1, int(len(times) * p / 100))]
+
+    def summary(self):
+        parts = [f"p50 {1000 * self.percentile(50):.1f}ms",
+                 f"p99 {1000 * self.percentile(99):.1f}ms"]
+        parts += [f"{name} {1000 * t:.1f}" for name, t in self.stages.items()]
+        return "  ".join(parts)
+
+    # Draw the rolling stats in the top-left corner of a surface.
+    def draw_overlay(self, surface):
+        if not self.overlay:
+            return
+        import pygame
+        if self._font is None:
+            pygame.font.init()
+            self._font = pygame.font.Font(None, 20)
+        text = self._font.render(self.summary(), True, (255, 255, 255), (0, 0, 0))
+        surface.blit(text, (4, 4))
+        return text.get_rect(topleft=(4, 4))
+
+    def close(self):
+        if self._trace:
+            self._trace.close()
+            self._trace = None
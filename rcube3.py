@@ -1,189 +1,180 @@
-import sys
-import pygame
-from pygame.locals import *
+import argparse
+import numpy as np
+from frame_profiler import FrameProfiler
+# The net viewer runs on the shared engine; Cube is re-exported for callers
+# of rcube3.Cube.
+from rcube_core import Cube, MoveHistory, FACES, FACE_INDEX, color_map
 
-# --------------------------
-# Utility: rotate a matrix clockwise
-# --------------------------
-def rotate_matrix_clockwise(mat):
-    # Return a new matrix rotated clockwise.
-    return [list(row) for row in zip(*mat[::-1])]
+# Colors for outlines/background.
+black = (0, 0, 0)
+gray  = (50, 50, 50)
 
 # --------------------------
-# Cube class definition
+# Net layout
 # --------------------------
-class Cube:
-    def __init__(self, n):
-        self.n = n
-        # Each face is represented as an n x n matrix with a face label.
-        # Standard color notation:
-        # U (up)=white, D (down)=yellow, F (front)=green, B (back)=blue,
-        # L (left)=orange, R (right)=red.
-        self.faces = {
-            'U': [[ 'U' for _ in range(n)] for _ in range(n)],
-            'D': [[ 'D' for _ in range(n)] for _ in range(n)],
-            'F': [[ 'F' for _ in range(n)] for _ in range(n)],
-            'B': [[ 'B' for _ in range(n)] for _ in range(n)],
-            'L': [[ 'L' for _ in range(n)] for _ in range(n)],
-            'R': [[ 'R' for _ in range(n)] for _ in range(n)]
-        }
-
-    def move_U(self):
-        n = self.n
-        # Rotate the U face itself.
-        self.faces['U'] = rotate_matrix_clockwise(self.faces['U'])
-        # Cycle the top rows of F, R, B, L.
-        temp = self.faces['F'][0][:]
-        self.faces['F'][0] = self.faces['R'][0][:]
-        self.faces['R'][0] = self.faces['B'][0][:]
-        self.faces['B'][0] = self.faces['L'][0][:]
-        self.faces['L'][0] = temp
-
-    def move_D(self):
-        n = self.n
-        self.faces['D'] = rotate_matrix_clockwise(self.faces['D'])
-        temp = self.faces['F'][n-1][:]
-        self.faces['F'][n-1] = self.faces['L'][n-1][:]
-        self.faces['L'][n-1] = self.faces['B'][n-1][:]
-        self.faces['B'][n-1] = self.faces['R'][n-1][:]
-        self.faces['R'][n-1] = temp
-
-    def move_F(self):
-        n = self.n
-        self.faces['F'] = rotate_matrix_clockwise(self.faces['F'])
-        # Cycle edges: U bottom row, L right column, D top row, R left column.
-        temp = self.faces['U'][n-1][:]
-        for i in range(n):
-            self.faces['U'][n-1][i] = self.faces['L'][n-1-i][n-1]
-            self.faces['L'][n-1-i][n-1] = self.faces['D'][0][n-1-i]
-            self.faces['D'][0][n-1-i] = self.faces['R'][i][0]
-            self.faces['R'][i][0] = temp[i]
-
-    def move_B(self):
-        n = self.n
-        self.faces['B'] = rotate_matrix_clockwise(self.faces['B'])
-        # Cycle edges: U top row, R right column, D bottom row, L left column.
-        temp = self.faces['U'][0][:]
-        for i in range(n):
-            self.faces['U'][0][i] = self.faces['R'][i][n-1]
-            self.faces['R'][i][n-1] = self.faces['D'][n-1][n-1-i]
-            self.faces['D'][n-1][n-1-i] = self.faces['L'][i][0]
-            self.faces['L'][i][0] = temp[n-1-i]
-
-    def move_L(self):
-        n = self.n
-        self.faces['L'] = rotate_matrix_clockwise(self.faces['L'])
-        # Cycle edges: U left column, B right column, D left column, F left column.
-        temp = [self.faces['U'][i][0] for i in range(n)]
-        for i in range(n):
-            self.faces['U'][i][0] = self.faces['B'][n-1-i][n-1]
-            self.faces['B'][n-1-i][n-1] = self.faces['D'][i][0]
-            self.faces['D'][i][0] = self.faces['F'][i][0]
-            self.faces['F'][i][0] = temp[i]
-
-    def move_R(self):
-        n = self.n
-        self.faces['R'] = rotate_matrix_clockwise(self.faces['R'])
-        # Cycle edges: U right column, F right column, D right column, B left column.
-        temp = [self.faces['U'][i][n-1] for i in range(n)]
-        for i in range(n):
-            self.faces['U'][i][n-1] = self.faces['F'][i][n-1]
-            self.faces['F'][i][n-1] = self.faces['D'][i][n-1]
-            self.faces['D'][i][n-1] = self.faces['B'][n-1-i][0]
-            self.faces['B'][n-1-i][0] = temp[i]
+# Using a common net layout:
+#      U
+# L  F  R  B
+#      D
+# Returns the top-left pixel of each face and the (width, height) of the net.
+def net_layout(n, cell_size=50, margin=10):
+    face_size = n * cell_size
+    face_positions = {
+        'U': (face_size + margin, 0),
+        'L': (0, face_size + margin),
+        'F': (face_size + margin, face_size + margin),
+        'R': (2 * face_size + 2 * margin, face_size + margin),
+        'B': (3 * face_size + 3 * margin, face_size + margin),
+        'D': (face_size + margin, 2 * face_size + 2 * margin)
+    }
+    return face_positions, (4 * face_size + 5 * margin, 3 * face_size + 4 * margin)
+
+# The net as a (height, width, 3) uint8 RGB image, drawn with NumPy only:
+# the same picture as the window (stickers with 2-pixel black borders on a
+# gray background), for thumbnails and offscreen rendering.
+def net_image(cube, cell_size=50, margin=10, border=2):
+    n = cube.n
+    face_positions, (width, height) = net_layout(n, cell_size, margin)
+    image = np.empty((height, width, 3), dtype=np.uint8)
+    image[:] = gray
+    palette = np.array([color_map[f] for f in FACES], dtype=np.uint8)
+    # One face worth of pixels: sticker (row, column) per pixel, and the
+    # pixels that belong to a sticker border.
+    local = np.arange(n * cell_size)
+    cells = (local // cell_size)[:, None] * n + local // cell_size
+    edge = (local % cell_size < border) | (local % cell_size >= cell_size - border)
+    edge = edge[:, None] | edge
+    state = cube.state.reshape(6, n * n)
+    for face, (x0, y0) in face_positions.items():
+        pixels = palette[state[FACE_INDEX[face]][cells]]
+        pixels[edge] = black
+        image[y0:y0 + n * cell_size, x0:x0 + n * cell_size] = pixels
+    return image
+
+# The net image on a new (or the given, net-sized) pygame surface.
+def render_net(cube, cell_size=50, margin=10, surface=None):
+    import pygame
+    image = net_image(cube, cell_size, margin).transpose(1, 0, 2)
+    if surface is None:
+        return pygame.surfarray.make_surface(image)
+    pygame.surfarray.blit_array(surface, image)
+    return surface
 
 # --------------------------
 # Pygame drawing and main loop
 # --------------------------
-def main():
+def main(argv=None):
+    import pygame
+    from pygame.locals import (QUIT, VIDEOEXPOSE, WINDOWEXPOSED, KEYDOWN, KMOD_CTRL, KMOD_SHIFT,
+                               K_u, K_d, K_f, K_b, K_l, K_r, K_y, K_z)
+    parser = argparse.ArgumentParser(description="Rubik's cube net emulator.")
+    parser.add_argument('n', nargs='?', default='3', help="cube size (default 3)")
+    parser.add_argument('--profile', action='store_true',
+                        help="time each stage and show rolling p50/p99 frame times on screen")
+    parser.add_argument('--trace', metavar='FILE', help="write per-frame stage timings as JSON lines")
+    args = parser.parse_args(argv)
+    profiler = FrameProfiler(args.profile, trace_path=args.trace)
+
     # Allow customizable cube size from command line (default 3).
     n = 3
-    if len(sys.argv) > 1:
-        try:
-            n = int(sys.argv[1])
-        except:
-            pass
-
-    # Define colors for faces (RGB tuples)
-    color_map = {
-        'U': (255, 255, 255),   # white
-        'D': (255, 255, 0),     # yellow
-        'F': (0, 255, 0),       # green
-        'B': (0, 0, 255),       # blue
-        'L': (255, 165, 0),     # orange
-        'R': (255, 0, 0)        # red
-    }
-    # Colors for outlines/background.
-    black = (0, 0, 0)
-    gray  = (50, 50, 50)
+    try:
+        n = int(args.n)
+    except ValueError:
+        pass
 
     pygame.init()
 
     # Set up sizes
     cell_size = 50
     margin = 10
-    face_size = n * cell_size
-    # Using a common net layout:
-    #      U
-    # L  F  R  B
-    #      D
-    win_width = 4 * face_size + 5 * margin
-    win_height = 3 * face_size + 4 * margin
-    screen = pygame.display.set_mode((win_width, win_height))
-    pygame.display.set_caption(f"Customizable {n}x{n} Rubik's Cube Emulator")
-
     # Determine positions for each face in the net.
-    face_positions = {
-        'U': (face_size + margin, 0),
-        'L': (0, face_size + margin),
-        'F': (face_size + margin, face_size + margin),
-        'R': (2 * face_size + 2 * margin, face_size + margin),
-        'B': (3 * face_size + 3 * margin, face_size + margin),
-        'D': (face_size + margin, 2 * face_size + 2 * margin)
-    }
+    face_positions, win_size = net_layout(n, cell_size, margin)
+    screen = pygame.display.set_mode(win_size)
+    pygame.display.set_caption(f"Customizable {n}x{n} Rubik's Cube Emulator")
 
     # Create the cube state.
     cube = Cube(n)
+    # Ctrl+Z undoes the last move, Ctrl+Y (or Ctrl+Shift+Z) redoes.
+    history = MoveHistory(cube)
+
+    # Draw one sticker of the net and return its rect.
+    def draw_sticker(face, i, j, color_label):
+        x0, y0 = face_positions[face]
+        color = color_map.get(color_label, black)
+        rect = pygame.Rect(x0 + j*cell_size, y0 + i*cell_size, cell_size, cell_size)
+        pygame.draw.rect(screen, color, rect)
+        pygame.draw.rect(screen, black, rect, 2)  # black border for clarity
+        return rect
+
+    # Sticker array as last drawn (None forces a full redraw) and the cube
+    # version it reflects.
+    drawn, drawn_version = None, None
 
     clock = pygame.time.Clock()
     running = True
 
     while running:
+        profiler.start_frame()
         for event in pygame.event.get():
             if event.type == QUIT:
                 running = False
+            elif event.type in (VIDEOEXPOSE, WINDOWEXPOSED):
+                drawn = None
             elif event.type == KEYDOWN:
+                mods = pygame.key.get_mods()
+                if event.key in (K_z, K_y) and mods & KMOD_CTRL:
+                    if event.key == K_y or mods & KMOD_SHIFT:
+                        history.redo()
+                    else:
+                        history.undo()
                 # Map key presses to moves (only clockwise moves here).
-                if event.key == K_u:
-                    cube.move_U()
+                elif event.key == K_u:
+                    history.apply('U')
                 elif event.key == K_d:
-                    cube.move_D()
+                    history.apply('D')
                 elif event.key == K_f:
-                    cube.move_F()
+                    history.apply('F')
                 elif event.key == K_b:
-                    cube.move_B()
+                    history.apply('B')
                 elif event.key == K_l:
-                    cube.move_L()
+                    history.apply('L')
                 elif event.key == K_r:
-                    cube.move_R()
-
-        # Clear screen
-        screen.fill(gray)
-
-        # Draw each face.
-        for face, pos in face_positions.items():
-            x0, y0 = pos
-            for i in range(n):
-                for j in range(n):
-                    color_label = cube.faces[face][i][j]
-                    color = color_map.get(color_label, black)
-                    rect = pygame.Rect(x0 + j*cell_size, y0 + i*cell_size, cell_size, cell_size)
-                    pygame.draw.rect(screen, color, rect)
-                    pygame.draw.rect(screen, black, rect, 2)  # black border for clarity
-
-        pygame.display.flip()
+                    history.apply('R')
+        profiler.mark('events')
+
+        if drawn is None:
+            # First frame or the window was exposed: draw the whole net.
+            screen.fill(gray)
+            faces = cube.faces
+            for face in face_positions:
+                for i in range(n):
+                    for j in range(n):
+                        draw_sticker(face, i, j, faces[face][i][j])
+            profiler.mark('draw')
+            profiler.draw_overlay(screen)
+            pygame.display.flip()
+            drawn = cube.state.copy()
+            drawn_version = cube.version
+        elif cube.version != drawn_version:
+            # Redraw and push to the display only the stickers that changed.
+            state = cube.state
+            rects = []
+            for k in np.flatnonzero(state != drawn).tolist():
+                face, cell = divmod(k, n * n)
+                rects.append(draw_sticker(FACES[face], cell // n, cell % n, FACES[state[k]]))
+            drawn = state.copy()
+            profiler.mark('draw')
+            overlay = profiler.draw_overlay(screen)
+            if overlay:
+                rects.append(overlay)
+            pygame.display.update(rects)
+            drawn_version = cube.version
+        profiler.mark('flip')
+        profiler.end_frame()
+
         clock.tick(30)
 
+    profiler.close()
     pygame.quit()
 
 if __name__ == '__main__':
@@ -1,195 +1,12 @@
-import sys, math, pygame
-from pygame.locals import *
+import sys, io, math, argparse
+from functools import lru_cache
+import numpy as np
+from frame_profiler import FrameProfiler
+from rcube_core import *
+from rcube_core import _CENTERS, _RIGHTS, _UPS
 
-# --- Color definitions (RGB) ---
-color_map = {
-    'U': (255, 255, 255),  # white
-    'D': (255, 255, 0),    # yellow
-    'F': (0, 255, 0),      # green
-    'B': (0, 0, 255),      # blue
-    'L': (255, 165, 0),    # orange
-    'R': (255, 0, 0)       # red
-}
-
-# --- Helper: Rotate a matrix clockwise ---
-def rotate_matrix_clockwise(mat):
-    return [list(row) for row in zip(*mat[::-1])]
-
-# --- Cube state class ---
-class Cube:
-    def __init__(self, n):
-        self.n = n
-        # Each face is stored as an n×n matrix with its identifying letter.
-        self.faces = {
-            'U': [[ 'U' for _ in range(n)] for _ in range(n)],
-            'D': [[ 'D' for _ in range(n)] for _ in range(n)],
-            'F': [[ 'F' for _ in range(n)] for _ in range(n)],
-            'B': [[ 'B' for _ in range(n)] for _ in range(n)],
-            'L': [[ 'L' for _ in range(n)] for _ in range(n)],
-            'R': [[ 'R' for _ in range(n)] for _ in range(n)]
-        }
-    
-    def print_cube(self, move=""):
-        if move:
-            print(f"\nPerformed move: {move}")
-        else:
-            print("\nCube state:")
-        for face in ['U', 'D', 'F', 'B', 'L', 'R']:
-            print(f"{face} face:")
-            for row in self.faces[face]:
-                print("  " + " ".join(row))
-        print("-" * 30)
-    
-    # --- Standard face moves (clockwise) ---
-    # Front move: when looking directly at F, a clockwise turn
-    def move_F(self):
-        n = self.n
-        self.faces['F'] = rotate_matrix_clockwise(self.faces['F'])
-        temp = self.faces['U'][n-1][:]
-        # U bottom row becomes reversed L right column
-        self.faces['U'][n-1] = list(reversed([self.faces['L'][i][n-1] for i in range(n)]))
-        # L right column becomes D top row
-        for i in range(n):
-            self.faces['L'][i][n-1] = self.faces['D'][0][i]
-        # D top row becomes reversed R left column
-        self.faces['D'][0] = list(reversed([self.faces['R'][i][0] for i in range(n)]))
-        # R left column becomes temp (unchanged order)
-        for i in range(n):
-            self.faces['R'][i][0] = temp[i]
-    
-    # Back move: when looking from the back, a clockwise turn on B
-    def move_B(self):
-        n = self.n
-        self.faces['B'] = rotate_matrix_clockwise(self.faces['B'])
-        temp = self.faces['U'][0][:]
-        # U top row becomes reversed R right column
-        self.faces['U'][0] = list(reversed([self.faces['R'][i][n-1] for i in range(n)]))
-        # R right column becomes D bottom row
-        for i in range(n):
-            self.faces['R'][i][n-1] = self.faces['D'][n-1][i]
-        # D bottom row becomes reversed L left column
-        self.faces['D'][n-1] = list(reversed([self.faces['L'][i][0] for i in range(n)]))
-        # L left column becomes temp
-        for i in range(n):
-            self.faces['L'][i][0] = temp[i]
-    
-    # Left move: when looking at the cube, L face turns clockwise
-    def move_L(self):
-        n = self.n
-        self.faces['L'] = rotate_matrix_clockwise(self.faces['L'])
-        temp = [self.faces['U'][i][0] for i in range(n)]
-        for i in range(n):
-            self.faces['U'][i][0] = self.faces['B'][n-1-i][n-1]
-        for i in range(n):
-            self.faces['B'][n-1-i][n-1] = self.faces['D'][i][0]
-        for i in range(n):
-            self.faces['D'][i][0] = self.faces['F'][i][0]
-        for i in range(n):
-            self.faces['F'][i][0] = temp[i]
-    
-    # Right move: when looking at the cube, R face turns clockwise
-    def move_R(self):
-        n = self.n
-        self.faces['R'] = rotate_matrix_clockwise(self.faces['R'])
-        temp = [self.faces['U'][i][n-1] for i in range(n)]
-        for i in range(n):
-            self.faces['U'][i][n-1] = self.faces['F'][i][n-1]
-        for i in range(n):
-            self.faces['F'][i][n-1] = self.faces['D'][i][n-1]
-        for i in range(n):
-            self.faces['D'][i][n-1] = self.faces['B'][n-1-i][0]
-        for i in range(n):
-            self.faces['B'][n-1-i][0] = temp[i]
-    
-    def move_U(self):
-        n = self.n
-        self.faces['U'] = rotate_matrix_clockwise(self.faces['U'])
-        temp = self.faces['F'][0][:]
-        self.faces['F'][0] = self.faces['R'][0][:]
-        self.faces['R'][0] = self.faces['B'][0][:]
-        self.faces['B'][0] = self.faces['L'][0][:]
-        self.faces['L'][0] = temp
-    
-    def move_D(self):
-        n = self.n
-        self.faces['D'] = rotate_matrix_clockwise(self.faces['D'])
-        temp = self.faces['F'][n-1][:]
-        self.faces['F'][n-1] = self.faces['L'][n-1][:]
-        self.faces['L'][n-1] = self.faces['B'][n-1][:]
-        self.faces['B'][n-1] = self.faces['R'][n-1][:]
-        self.faces['R'][n-1] = temp
-
-    # --- Inverse moves (counterclockwise): three clockwise moves ---
-    def move_F_cc(self):
-        for _ in range(3): self.move_F()
-    def move_B_cc(self):
-        for _ in range(3): self.move_B()
-    def move_L_cc(self):
-        for _ in range(3): self.move_L()
-    def move_R_cc(self):
-        for _ in range(3): self.move_R()
-    def move_U_cc(self):
-        for _ in range(3): self.move_U()
-    def move_D_cc(self):
-        for _ in range(3): self.move_D()
-    
-    # --- Additional moves for 3x3 only ---
-    # M move: rotates the middle vertical slice (affects U, F, D, B)
-    def move_M(self):
-        m = self.n // 2
-        for i in range(self.n):
-            temp = self.faces['U'][i][m]
-            self.faces['U'][i][m] = self.faces['F'][i][m]
-            self.faces['F'][i][m] = self.faces['D'][i][m]
-            self.faces['D'][i][m] = self.faces['B'][i][m]
-            self.faces['B'][i][m] = temp
-
-    def move_M_cc(self):
-        m = self.n // 2
-        for i in range(self.n):
-            temp = self.faces['U'][i][m]
-            self.faces['U'][i][m] = self.faces['B'][i][m]
-            self.faces['B'][i][m] = self.faces['D'][i][m]
-            self.faces['D'][i][m] = self.faces['F'][i][m]
-            self.faces['F'][i][m] = temp
-
-    # E move: rotates the equatorial (middle horizontal) layer (affects F, R, B, L)
-    def move_E(self):
-        m = self.n // 2
-        temp = self.faces['F'][m][:]
-        self.faces['F'][m] = self.faces['R'][m][:]
-        self.faces['R'][m] = self.faces['B'][m][:]
-        self.faces['B'][m] = self.faces['L'][m][:]
-        self.faces['L'][m] = temp
-
-    def move_E_cc(self):
-        m = self.n // 2
-        temp = self.faces['F'][m][:]
-        self.faces['F'][m] = self.faces['L'][m][:]
-        self.faces['L'][m] = self.faces['B'][m][:]
-        self.faces['B'][m] = self.faces['R'][m][:]
-        self.faces['R'][m] = temp
-
-    # S move: rotates the slice parallel to the F face (affects one cell from U, R, D, L)
-    # For 3x3, rotates:
-    #   U bottom-middle, L middle-right, D top-middle, R middle-left.
-    def move_S(self):
-        m = self.n // 2
-        n = self.n
-        temp = self.faces['U'][n-1][m]
-        self.faces['U'][n-1][m] = self.faces['L'][m][n-1]
-        self.faces['L'][m][n-1] = self.faces['D'][0][m]
-        self.faces['D'][0][m] = self.faces['R'][m][0]
-        self.faces['R'][m][0] = temp
-
-    def move_S_cc(self):
-        m = self.n // 2
-        n = self.n
-        temp = self.faces['U'][n-1][m]
-        self.faces['U'][n-1][m] = self.faces['R'][m][0]
-        self.faces['R'][m][0] = self.faces['D'][0][m]
-        self.faces['D'][0][m] = self.faces['L'][m][n-1]
-        self.faces['L'][m][n-1] = temp
+# The cube engine lives in rcube_core and is re-exported here, so
+# rcube3d.Cube and friends keep working; this module adds the 3D view.
 
 # --- 3D rotation & projection functions (manual math) ---
 def rotate_point(p, rot_x, rot_y):
@@ -209,52 +26,312 @@ def project_point(p, screen_width, screen_height, fov, viewer_distance):
     y_proj = -y * factor + screen_height / 2
     return (int(x_proj), int(y_proj))
 
-# --- Build polygons for each face (using painter's algorithm) ---
-def get_face_polygons(face_matrix, n, center, right_vec, up_vec, rot_x, rot_y, screen_width, screen_height, fov, viewer_distance):
-    polys = []
-    cell_size = 2.0 / n  # each cube face spans 2 units
-    for i in range(n):
-        for j in range(n):
-            left = -1 + j * cell_size
-            right_edge = -1 + (j+1) * cell_size
-            top = 1 - i * cell_size
-            bottom = 1 - (i+1) * cell_size
-            def local_to_world(local_x, local_y):
-                return (center[0] + local_x * right_vec[0] + local_y * up_vec[0],
-                        center[1] + local_x * right_vec[1] + local_y * up_vec[1],
-                        center[2] + local_x * right_vec[2] + local_y * up_vec[2])
-            tl = local_to_world(left, top)
-            tr = local_to_world(right_edge, top)
-            br = local_to_world(right_edge, bottom)
-            bl = local_to_world(left, bottom)
-            rtl = rotate_point(tl, rot_x, rot_y)
-            rtr = rotate_point(tr, rot_x, rot_y)
-            rbr = rotate_point(br, rot_x, rot_y)
-            rbl = rotate_point(bl, rot_x, rot_y)
-            avg_z = (rtl[2] + rtr[2] + rbr[2] + rbl[2]) / 4.0
-            ptl = project_point(rtl, screen_width, screen_height, fov, viewer_distance)
-            ptr = project_point(rtr, screen_width, screen_height, fov, viewer_distance)
-            pbr = project_point(rbr, screen_width, screen_height, fov, viewer_distance)
-            pbl = project_point(rbl, screen_width, screen_height, fov, viewer_distance)
-            col_letter = face_matrix[i][j]
-            col = color_map.get(col_letter, (0, 0, 0))
-            polys.append((avg_z, [ptl, ptr, pbr, pbl], col))
-    return polys
+# Combined rotation (about X, then about Y) as one 3×3 matrix, matching
+# rotate_point.
+def view_matrix(rot_x, rot_y):
+    rx = math.radians(rot_x)
+    ry = math.radians(rot_y)
+    cx, sx = math.cos(rx), math.sin(rx)
+    cy, sy = math.cos(ry), math.sin(ry)
+    mx = np.array([[1, 0, 0], [0, cx, -sx], [0, sx, cx]])
+    my = np.array([[cy, 0, sy], [0, 1, 0], [-sy, 0, cy]])
+    return my @ mx
+
+# Rotate and project an (N, 3) array of points; returns the rotated z values
+# and integer screen coordinates, matching project_point.
+def project_points(points, rot_x, rot_y, screen_width, screen_height, fov, viewer_distance):
+    rotated = points @ view_matrix(rot_x, rot_y).T
+    depth = rotated[:, 2] + viewer_distance
+    factor = fov / np.where(depth != 0, depth, 1)
+    factor[depth == 0] = fov
+    screen = np.empty((len(points), 2))
+    screen[:, 0] = rotated[:, 0] * factor + screen_width / 2
+    screen[:, 1] = -rotated[:, 1] * factor + screen_height / 2
+    return rotated[:, 2], screen.astype(np.intp)
+
+# --- Sticker mesh ---
+# Per n: the (n+1)² corner grid of every face in world space (faces in
+# FACE_FRAMES order), the four grid corners of each sticker (tl, tr, br, bl)
+# and the state index each sticker polygon shows.  Neighboring stickers share
+# corners, so each vertex is transformed once per frame.
+@lru_cache(maxsize=None)
+def face_mesh(n):
+    edges = np.linspace(-1.0, 1.0, n + 1)
+    order = [FACE_INDEX[f] for f in FACE_FRAMES]
+    centers, rights, ups = _CENTERS[order], _RIGHTS[order], _UPS[order]
+    verts = (centers[:, None, None, :]
+             + edges[None, None, :, None] * rights[:, None, None, :]
+             + edges[None, ::-1, None, None] * ups[:, None, None, :])
+    grid = np.arange(6 * (n + 1) ** 2).reshape(6, n + 1, n + 1)
+    corners = np.stack([grid[:, :-1, :-1], grid[:, :-1, 1:],
+                        grid[:, 1:, 1:], grid[:, 1:, :-1]], axis=-1).reshape(-1, 4)
+    stickers = (np.array(order)[:, None] * n * n + np.arange(n * n)).reshape(-1)
+    verts = verts.reshape(-1, 3)
+    for a in (verts, corners, stickers):
+        a.setflags(write=False)
+    return verts, corners, stickers
+
+# --- Back-face culling ---
+# FACE_FRAMES positions of the faces turned towards a camera sitting at
+# z = -viewer_distance, furthest first.  The cube is convex, so visible faces
+# never overlap on screen and can be drawn whole in this order without
+# sorting individual stickers.
+def visible_faces(rot_x, rot_y, viewer_distance):
+    centers = np.array([c for c, _, _ in FACE_FRAMES.values()]) @ view_matrix(rot_x, rot_y).T
+    # Camera-to-center dotted with the outward normal (both the rotated center).
+    facing = -viewer_distance * centers[:, 2] - 1
+    visible = np.flatnonzero(facing > 0)
+    return visible[np.argsort(-centers[visible, 2], kind='stable')].tolist()
+
+# --- Build polygons for every sticker (using painter's algorithm) ---
+# Returns (average z, [tl, tr, br, bl], color) per sticker.  With `faces`
+# (FACE_FRAMES positions, e.g. from visible_faces) only those faces are
+# built, in that order.
+def accumulate_all_polygons(cube, rot_x, rot_y, screen_width, screen_height, fov, viewer_distance, faces=None):
+    avg_z, quads, stickers = project_stickers(cube.n, rot_x, rot_y, screen_width, screen_height,
+                                              fov, viewer_distance, faces)
+    palette = [color_map[f] for f in FACES]
+    colors = [palette[v] for v in cube.state[stickers].tolist()]
+    return list(zip(avg_z.tolist(), quads.tolist(), colors))
+
+# The same polygons as arrays: average z (k,), screen corners (k, 4, 2) and
+# the state index of each sticker (k,).
+def project_stickers(n, rot_x, rot_y, screen_width, screen_height, fov, viewer_distance, faces=None):
+    verts, corners, stickers = face_mesh(n)
+    if faces is not None:
+        rows = (np.asarray(faces, dtype=np.intp)[:, None] * n * n + np.arange(n * n)).reshape(-1)
+        corners, stickers = corners[rows], stickers[rows]
+    z, screen = project_points(verts, rot_x, rot_y, screen_width, screen_height, fov, viewer_distance)
+    return z[corners].mean(axis=1), screen[corners], stickers
+
+# --- Sticker picking ---
+# Maps screen points to stickers and mouse drags to layer turns.  The
+# projected polygons of the visible faces are bucketed into a uniform grid
+# of roughly sticker-sized cells, so a lookup tests only the few polygons in
+# one cell.  Sticker geometry depends only on n and the camera, so the grid
+# is rebuilt when those (or the window size) change, not after moves.
+# Polygons with a corner at or behind PICK_NEAR in front of the camera, or
+# wholly off-screen, can't be picked; the rest are clipped to the window and
+# the grid has at most PICK_GRID_CELLS cells, so a close camera can't blow
+# it up.
+PICK_NEAR = 0.01
+PICK_GRID_CELLS = 1 << 16
+
 
-def accumulate_all_polygons(cube, rot_x, rot_y, screen_width, screen_height, fov, viewer_distance):
-    polys = []
+class StickerPicker:
+    def __init__(self):
+        self._key = None
+
+    def update(self, n, rot_x, rot_y, screen_size, fov, viewer_distance):
+        key = (n, rot_x, rot_y, tuple(screen_size), fov, viewer_distance)
+        if key == self._key:
+            return
+        self._key = key
+        self.n = n
+        faces = visible_faces(rot_x, rot_y, viewer_distance)
+        verts, corners, stickers = face_mesh(n)
+        rows = (np.asarray(faces, dtype=np.intp)[:, None] * n * n + np.arange(n * n)).reshape(-1)
+        corners, stickers = corners[rows], stickers[rows]
+        z, screen = project_points(verts, rot_x, rot_y, *screen_size, fov, viewer_distance)
+        quads = screen[corners]
+        lo, hi = quads.min(axis=1), quads.max(axis=1)
+        size = np.asarray(screen_size, dtype=np.intp)
+        keep = ((z[corners] + viewer_distance > PICK_NEAR).all(axis=1)
+                & (hi >= 0).all(axis=1) & (lo < size).all(axis=1))
+        self.quads, self.stickers = quads[keep], stickers[keep]
+        lo, hi = np.clip(lo[keep], 0, size - 1), np.clip(hi[keep], 0, size - 1)
+        self.origin = lo.min(axis=0) if len(lo) else np.zeros(2, dtype=np.intp)
+        extent = (hi.max(axis=0) - self.origin + 1) if len(lo) else np.ones(2, dtype=np.intp)
+        self.cell = max(1, int(np.median(hi - lo))) if len(lo) else 1
+        self.cell = max(self.cell, int(np.ceil(np.sqrt(extent.prod() / PICK_GRID_CELLS))))
+        c0, c1 = (lo - self.origin) // self.cell, (hi - self.origin) // self.cell
+        self.grid_size = (extent - 1) // self.cell + 1
+        # Enter each polygon into every cell its bounding box touches, then
+        # group the entries by cell (CSR layout: items[starts[c]:starts[c+1]]).
+        spans = c1 - c0 + 1
+        counts = spans[:, 0] * spans[:, 1]
+        owner = np.repeat(np.arange(len(counts)), counts)
+        local = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        cx = c0[owner, 0] + local % spans[owner, 0]
+        cy = c0[owner, 1] + local // spans[owner, 0]
+        cells = cy * self.grid_size[0] + cx
+        order = np.argsort(cells, kind='stable')
+        self.items = owner[order]
+        self.starts = np.searchsorted(cells[order], np.arange(self.grid_size.prod() + 1))
+
+    # Row (into quads / stickers) of the polygon under a screen point, or None.
+    def _row(self, point):
+        point = np.asarray(point, dtype=np.intp)
+        cx, cy = (point - self.origin) // self.cell
+        if not (0 <= cx < self.grid_size[0] and 0 <= cy < self.grid_size[1]):
+            return None
+        c = cy * self.grid_size[0] + cx
+        rows = self.items[self.starts[c]:self.starts[c + 1]]
+        # Inside a convex polygon: on the same side of all four edges.
+        quads = self.quads[rows]
+        edges = np.roll(quads, -1, axis=1) - quads
+        rel = point - quads
+        cross = edges[:, :, 0] * rel[:, :, 1] - edges[:, :, 1] * rel[:, :, 0]
+        inside = (cross >= 0).all(axis=1) | (cross <= 0).all(axis=1)
+        hits = rows[inside]
+        return int(hits[0]) if len(hits) else None
+
+    # State index of the sticker under a screen point, or None.
+    def pick(self, point):
+        row = self._row(point)
+        return None if row is None else int(self.stickers[row])
+
+    # Layer turn for dragging from start to end: the sticker under start
+    # moves along whichever of its face's row or column directions the drag
+    # follows more closely.  Returns a move name or None off the cube.
+    def drag_move(self, start, end):
+        row = self._row(start)
+        if row is None:
+            return None
+        sticker = int(self.stickers[row])
+        tl, tr, br, bl = self.quads[row].astype(float)
+        drag = np.subtract(end, start, dtype=float)
+        screen_right, screen_up = (tr - tl + br - bl) / 2, (tl - bl + tr - br) / 2
+        k = sticker // (self.n * self.n)
+        normal, right, up = (np.array(v) for v in (_CENTERS[k], _RIGHTS[k], _UPS[k]))
+        along = [(abs(drag @ s) / (np.linalg.norm(s) or 1), np.sign(drag @ s) * w)
+                 for s, w in ((screen_right, right), (screen_up, up))]
+        direction = max(along, key=lambda a: a[0])[1]
+        if not direction.any():
+            return None
+        axis = 3 - int(np.argmax(abs(normal))) - int(np.argmax(abs(direction)))
+        pos = sticker_positions(self.n)[sticker]
+        # A clockwise quarter turn about +axis moves a point p by -(e × p).
+        e = np.eye(3, dtype=np.intp)[axis]
+        turns = 1 if -np.cross(e, pos) @ direction > 0 else 3
+        layer = (self.n - 1 - int(pos[axis])) // 2
+        return axis_move_name(self.n, axis, layer, turns)
+
+# --- Greedy meshing ---
+# Merge same-colored stickers of one n×n face into rectangles, returned as
+# (i0, j0, i1, j1, value) with half-open row and column ranges.  Row runs are
+# found with NumPy; runs with identical extent and color in consecutive rows
+# are merged into one rectangle.
+def greedy_quads(face):
+    n = face.shape[1]
+    quads = []
+    open_runs = {}
+    for i, row in enumerate(face):
+        starts = np.concatenate(([0], np.flatnonzero(row[1:] != row[:-1]) + 1))
+        ends = np.append(starts[1:], n)
+        runs = {}
+        for j0, j1, v in zip(starts.tolist(), ends.tolist(), row[starts].tolist()):
+            runs[(j0, j1, v)] = open_runs.pop((j0, j1, v), i)
+        for (j0, j1, v), i0 in open_runs.items():
+            quads.append((i0, j0, i, j1, v))
+        open_runs = runs
+    for (j0, j1, v), i0 in open_runs.items():
+        quads.append((i0, j0, len(face), j1, v))
+    return quads
+
+
+# Keeps the merged quads of each face and rebuilds only the faces whose
+# stickers changed since the last frame, so after a move just the touched
+# faces are re-meshed.
+class FaceMesher:
+    def __init__(self):
+        self._faces = {}
+
+    # Corner indices into face_mesh(n) vertices and sticker values of the
+    # merged quads of one face (a FACE_FRAMES position).
+    def quads(self, cube, pos):
+        n = cube.n
+        k = FACE_INDEX[list(FACE_FRAMES)[pos]]
+        face = cube.state[k * n * n:(k + 1) * n * n]
+        key = (n, face.tobytes())
+        cached = self._faces.get(pos)
+        if cached is None or cached[0] != key:
+            quads = np.array(greedy_quads(face.reshape(n, n)), dtype=np.intp).reshape(-1, 5)
+            i0, j0, i1, j1, values = quads.T
+            base = pos * (n + 1) ** 2
+            corners = base + np.stack([i0 * (n + 1) + j0, i0 * (n + 1) + j1,
+                                       i1 * (n + 1) + j1, i1 * (n + 1) + j0], axis=1)
+            cached = self._faces[pos] = (key, corners, values)
+        return cached[1], cached[2]
+
+
+# --- Drawing ---
+# Draw the cube onto a surface.  Visible faces are filled as merged quads
+# (one draw call per same-colored rectangle) and the sticker borders as
+# 2(n+1) grid lines per face.  Level of detail: when a sticker would be
+# smaller than outline_min_px on screen its borders are skipped.
+def draw_cube(surface, cube, rot_x, rot_y, fov, viewer_distance, mesher, outline_min_px=4, profiler=None):
+    import pygame
     n = cube.n
-    # Define face centers and local axes:
-    polys.extend(get_face_polygons(cube.faces['F'], n, (0,0,1), (1,0,0), (0,1,0), rot_x, rot_y, screen_width, screen_height, fov, viewer_distance))
-    polys.extend(get_face_polygons(cube.faces['B'], n, (0,0,-1), (-1,0,0), (0,1,0), rot_x, rot_y, screen_width, screen_height, fov, viewer_distance))
-    polys.extend(get_face_polygons(cube.faces['U'], n, (0,1,0), (1,0,0), (0,0,-1), rot_x, rot_y, screen_width, screen_height, fov, viewer_distance))
-    polys.extend(get_face_polygons(cube.faces['D'], n, (0,-1,0), (1,0,0), (0,0,1), rot_x, rot_y, screen_width, screen_height, fov, viewer_distance))
-    polys.extend(get_face_polygons(cube.faces['L'], n, (-1,0,0), (0,0,1), (0,1,0), rot_x, rot_y, screen_width, screen_height, fov, viewer_distance))
-    polys.extend(get_face_polygons(cube.faces['R'], n, (1,0,0), (0,0,-1), (0,1,0), rot_x, rot_y, screen_width, screen_height, fov, viewer_distance))
-    return polys
+    screen_width, screen_height = surface.get_size()
+    faces = visible_faces(rot_x, rot_y, viewer_distance)
+    if profiler:
+        profiler.mark('sort')
+    verts = face_mesh(n)[0]
+    _, screen = project_points(verts, rot_x, rot_y, screen_width, screen_height, fov, viewer_distance)
+    points = screen.tolist()
+    meshes = [(pos, mesher.quads(cube, pos)) for pos in faces]
+    if profiler:
+        profiler.mark('build')
+    palette = [color_map[f] for f in FACES]
+    outlines = 2 * fov / (viewer_distance * n) >= outline_min_px
+    for pos, (corners, values) in meshes:
+        for quad, v in zip(corners.tolist(), values.tolist()):
+            pygame.draw.polygon(surface, palette[v], [points[c] for c in quad])
+        if outlines:
+            base = pos * (n + 1) ** 2
+            for a in range(n + 1):
+                row = base + a * (n + 1)
+                pygame.draw.line(surface, (0, 0, 0), points[row], points[row + n])
+                pygame.draw.line(surface, (0, 0, 0), points[base + a], points[base + n * (n + 1) + a])
+    if profiler:
+        profiler.mark('draw')
+
+# --- Offscreen rendering ---
+# Render a cube to a new (or the given) surface without a window; pygame
+# surfaces need no display.  Pass the same mesher across frames of one
+# replay so only the faces that changed are re-meshed.
+def render_cube(cube, rot_x=25, rot_y=-30, viewer_distance=4, size=(800, 600), fov=256,
+                mesher=None, surface=None, background=(50, 50, 50)):
+    import pygame
+    if surface is None:
+        surface = pygame.Surface(size)
+    surface.fill(background)
+    draw_cube(surface, cube, rot_x, rot_y, fov, viewer_distance, mesher or FaceMesher())
+    return surface
+
+# (height, width, 3) uint8 RGB copy of a surface.
+def surface_image(surface):
+    import pygame
+    return pygame.surfarray.array3d(surface).transpose(1, 0, 2).copy()
 
 # --- Main program ---
-def main():
+def main(argv=None):
+    # pygame is only needed by the viewer, so the cube engine and headless
+    # tools can import this module without it.
+    import pygame
+    from pygame.locals import (QUIT, VIDEOEXPOSE, WINDOWEXPOSED, MOUSEBUTTONDOWN, MOUSEBUTTONUP,
+                               MOUSEMOTION, KEYDOWN, KMOD_SHIFT, KMOD_CTRL, K_w, K_u, K_d, K_f,
+                               K_b, K_l, K_r, K_m, K_e, K_s, K_y, K_z)
+    parser = argparse.ArgumentParser(description="3D Rubik's cube emulator.")
+    parser.add_argument('--profile', action='store_true',
+                        help="time each stage and show rolling p50/p99 frame times on screen")
+    parser.add_argument('--trace', metavar='FILE', help="write per-frame stage timings as JSON lines")
+    parser.add_argument('--console', choices=('full', 'buffered', 'off'), default='full',
+                        help="print the cube after every move, buffer that output, or skip it")
+    args = parser.parse_args(argv)
+    profiler = FrameProfiler(args.profile, trace_path=args.trace)
+
+    # Console output: straight to stdout, collected and written in chunks,
+    # or dropped.  Dumping a large cube after every move dominates latency.
+    console = io.StringIO() if args.console == 'buffered' else sys.stdout
+    def say(*text):
+        if args.console != 'off':
+            print(*text, file=console)
+    def show(move=""):
+        if args.console != 'off':
+            cube.print_cube(move, file=console)
+
     pygame.init()
     screen_width, screen_height = 800, 600
     screen = pygame.display.set_mode((screen_width, screen_height))
@@ -267,6 +344,16 @@ def main():
     
     cube_dim = 3
     cube = Cube(cube_dim)
+    # Moves entered during a frame are merged and cancelled before they
+    # reach the cube, so "U U U" costs one turn and "U U'" none.
+    pending = MoveSimplifier(cube_dim)
+    # Ctrl+Z undoes the last applied move, Ctrl+Y (or Ctrl+Shift+Z) redoes.
+    history = MoveHistory(cube)
+    mesher = FaceMesher()
+    picker = StickerPicker()
+    # What the window currently shows; idle frames with an unchanged cube,
+    # camera and window size skip rendering and flipping altogether.
+    shown_cube, shown_key = None, None
     
     # Default camera parameters
     default_rot_x, default_rot_y = 25, -30
@@ -276,18 +363,25 @@ def main():
     # Mouse control flags
     rotating = False    # left-click drag rotates view (inverted)
     zooming = False     # middle-click drag adjusts zoom
-    face_drag = False   # right-click drag rotates front face
+    face_drag = False   # right-click drag turns the layer under the cursor
     last_mouse_pos = (0, 0)
     zoom_start_dist = viewer_distance
     face_drag_start = None
     face_drag_threshold = 30  # pixels
+    # Face and slice keys; with Shift they turn counterclockwise.
+    key_moves = {K_u: 'U', K_d: 'D', K_f: 'F', K_b: 'B', K_l: 'L', K_r: 'R',
+                 K_m: 'M', K_e: 'E', K_s: 'S'}
     
     running = True
     while running:
+        profiler.start_frame()
         for event in pygame.event.get():
             if event.type == QUIT:
                 running = False
             
+            elif event.type in (VIDEOEXPOSE, WINDOWEXPOSED):
+                shown_cube = None
+            
             elif event.type == MOUSEBUTTONDOWN:
                 if event.button == 1:  # left click: rotate view (inverted)
                     rotating = True
@@ -296,20 +390,25 @@ def main():
                     zooming = True
                     last_mouse_pos = event.pos
                     zoom_start_dist = viewer_distance
-                elif event.button == 3:  # right click: face rotation (F move)
+                elif event.button == 3:  # right click: drag a sticker to turn its layer
                     face_drag = True
                     face_drag_start = event.pos
+                    picker.update(cube_dim, rot_x, rot_y, screen.get_size(), fov, viewer_distance)
                 elif event.button == 4:  # scroll up: increase cube dimension
                     cube_dim += 1
                     cube = Cube(cube_dim)
-                    print("\nCube dimension increased to", cube_dim)
-                    cube.print_cube()
+                    pending = MoveSimplifier(cube_dim)
+                    history = MoveHistory(cube)
+                    say("\nCube dimension increased to", cube_dim)
+                    show()
                 elif event.button == 5:  # scroll down: decrease cube dimension (min 2)
                     if cube_dim > 2:
                         cube_dim -= 1
                         cube = Cube(cube_dim)
-                        print("\nCube dimension decreased to", cube_dim)
-                        cube.print_cube()
+                        pending = MoveSimplifier(cube_dim)
+                        history = MoveHistory(cube)
+                        say("\nCube dimension decreased to", cube_dim)
+                        show()
             
             elif event.type == MOUSEBUTTONUP:
                 if event.button == 1:
@@ -319,20 +418,13 @@ def main():
                 elif event.button == 3:
                     if face_drag and face_drag_start:
                         dx = event.pos[0] - face_drag_start[0]
-                        mods = pygame.key.get_mods()
-                        if abs(dx) > face_drag_threshold:
-                            if dx > 0:
-                                if mods & KMOD_SHIFT:
-                                    cube.move_F_cc(); move = "F'"
-                                else:
-                                    cube.move_F(); move = "F"
-                            else:
-                                if mods & KMOD_SHIFT:
-                                    cube.move_F(); move = "F"
-                                else:
-                                    cube.move_F_cc(); move = "F'"
-                            print(f"\nPerformed face drag move: {move}")
-                            cube.print_cube(move)
+                        dy = event.pos[1] - face_drag_start[1]
+                        move = None
+                        if math.hypot(dx, dy) > face_drag_threshold:
+                            move = picker.drag_move(face_drag_start, event.pos)
+                        if move:
+                            say(f"\nPerformed drag move: {move}")
+                            pending.push(move)
                     face_drag = False
                     face_drag_start = None
             
@@ -350,71 +442,48 @@ def main():
             
             elif event.type == KEYDOWN:
                 mods = pygame.key.get_mods()
-                move = ""
                 if event.key == K_w:
                     rot_x, rot_y = default_rot_x, default_rot_y
                     viewer_distance = default_viewer_distance
-                    print("\nCamera orientation reset.")
-                elif event.key == K_u:
-                    if mods & KMOD_SHIFT:
-                        cube.move_U_cc(); move = "U'"
-                    else:
-                        cube.move_U(); move = "U"
-                elif event.key == K_d:
-                    if mods & KMOD_SHIFT:
-                        cube.move_D_cc(); move = "D'"
-                    else:
-                        cube.move_D(); move = "D"
-                elif event.key == K_f:
-                    if mods & KMOD_SHIFT:
-                        cube.move_F_cc(); move = "F'"
-                    else:
-                        cube.move_F(); move = "F"
-                elif event.key == K_b:
-                    if mods & KMOD_SHIFT:
-                        cube.move_B_cc(); move = "B'"
+                    say("\nCamera orientation reset.")
+                elif event.key in (K_z, K_y) and mods & KMOD_CTRL:
+                    # Moves still pending this frame come first.
+                    history.apply(pending.flush())
+                    action = 'redo' if event.key == K_y or mods & KMOD_SHIFT else 'undo'
+                    moves = history.redo() if action == 'redo' else history.undo()
+                    if moves:
+                        show(f"{action} {' '.join(moves)}")
                     else:
-                        cube.move_B(); move = "B"
-                elif event.key == K_l:
-                    if mods & KMOD_SHIFT:
-                        cube.move_L_cc(); move = "L'"
-                    else:
-                        cube.move_L(); move = "L"
-                elif event.key == K_r:
-                    if mods & KMOD_SHIFT:
-                        cube.move_R_cc(); move = "R'"
-                    else:
-                        cube.move_R(); move = "R"
-                elif event.key == K_m:
-                    if mods & KMOD_SHIFT:
-                        cube.move_M_cc() if hasattr(cube, "move_M_cc") else cube.move_M(); move = "M'"
-                    else:
-                        cube.move_M(); move = "M"
-                elif event.key == K_e:
-                    if mods & KMOD_SHIFT:
-                        cube.move_E_cc() if hasattr(cube, "move_E_cc") else cube.move_E(); move = "E'"
-                    else:
-                        cube.move_E(); move = "E"
-                elif event.key == K_s:
-                    if mods & KMOD_SHIFT:
-                        cube.move_S_cc(); move = "S'"
-                    else:
-                        cube.move_S(); move = "S"
-                if move:
-                    cube.print_cube(move)
+                        say(f"\nNothing to {action}.")
+                elif event.key in key_moves:
+                    move = key_moves[event.key] + ("'" if mods & KMOD_SHIFT else "")
+                    pending.push(move)
+        moves = pending.flush()
+        history.apply(moves)
+        if moves:
+            show(" ".join(moves))
+        profiler.mark('events')
+        if console is not sys.stdout and console.tell() > 1 << 16:
+            sys.stdout.write(console.getvalue())
+            console.seek(0)
+            console.truncate()
+        profiler.mark('print')
         
         # --- Rendering ---
-        screen.fill((50, 50, 50))
-        polygons = accumulate_all_polygons(cube, rot_x, rot_y, screen_width, screen_height, fov, viewer_distance)
-        # Painter's algorithm: sort polygons by average depth (furthest first)
-        polygons.sort(key=lambda poly: poly[0], reverse=True)
-        for _, pts, col in polygons:
-            pygame.draw.polygon(screen, col, pts)
-            pygame.draw.polygon(screen, (0, 0, 0), pts, 1)
-        
-        pygame.display.flip()
+        frame_key = (cube.version, rot_x, rot_y, viewer_distance, screen.get_size())
+        if cube is not shown_cube or frame_key != shown_key:
+            screen.fill((50, 50, 50))
+            draw_cube(screen, cube, rot_x, rot_y, fov, viewer_distance, mesher, profiler=profiler)
+            profiler.draw_overlay(screen)
+            pygame.display.flip()
+            profiler.mark('flip')
+            shown_cube, shown_key = cube, frame_key
+        profiler.end_frame()
         clock.tick(30)
     
+    if console is not sys.stdout:
+        sys.stdout.write(console.getvalue())
+    profiler.close()
     pygame.quit()
     sys.exit()
 
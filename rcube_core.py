@@ -0,0 +1,1184 @@
+import sys, math, re, itertools
+from collections import OrderedDict, deque
+from functools import lru_cache, wraps
+import numpy as np
+
+# --- Headless cube engine ---
+# Sticker layout, moves, the Cube and CubeBatch classes, move sequences,
+# encodings and symmetries.  Only numpy is needed, so solvers, replays and
+# worker processes can import this without pygame; the viewers in rcube3d
+# (3D) and rcube3 (net) build on it.
+
+# --- Color definitions (RGB) ---
+color_map = {
+    'U': (255, 255, 255),  # white
+    'D': (255, 255, 0),    # yellow
+    'F': (0, 255, 0),      # green
+    'B': (0, 0, 255),      # blue
+    'L': (255, 165, 0),    # orange
+    'R': (255, 0, 0)       # red
+}
+
+# --- Sticker layout ---
+# All 6·n² stickers live in one flat uint8 array: face-major in FACES order,
+# then row, then column.  A sticker's value is the index of its home face.
+FACES = ('U', 'D', 'F', 'B', 'L', 'R')
+FACE_INDEX = {face: k for k, face in enumerate(FACES)}
+FACE_LETTERS = np.array(FACES)
+
+# Face centers and local (right, up) axes in world space.  Row 0 of a face is
+# its "up" edge and column 0 its "left" edge; the renderer uses the same frames.
+FACE_FRAMES = {
+    'F': ((0, 0, 1), (1, 0, 0), (0, 1, 0)),
+    'B': ((0, 0, -1), (-1, 0, 0), (0, 1, 0)),
+    'U': ((0, 1, 0), (1, 0, 0), (0, 0, -1)),
+    'D': ((0, -1, 0), (1, 0, 0), (0, 0, 1)),
+    'L': ((-1, 0, 0), (0, 0, 1), (0, 1, 0)),
+    'R': ((1, 0, 0), (0, 0, -1), (0, 1, 0)),
+}
+_CENTERS = np.array([FACE_FRAMES[f][0] for f in FACES])
+_RIGHTS = np.array([FACE_FRAMES[f][1] for f in FACES])
+_UPS = np.array([FACE_FRAMES[f][2] for f in FACES])
+
+# Face turns as (axis, counted from the positive side).  Axes are x=0 (R),
+# y=1 (U) and z=2 (F); layer_permutation counts layers from the positive side
+# and turns clockwise as seen from there, so L, D and B flip both.
+_FACE_AXES = {
+    'R': (0, True), 'L': (0, False),
+    'U': (1, True), 'D': (1, False),
+    'F': (2, True), 'B': (2, False),
+}
+# Slices follow standard notation: M turns like L, E like D and S like F.
+# x, y and z turn the whole cube like R, U and F.
+_SLICE_FACES = {'M': 'L', 'E': 'D', 'S': 'F'}
+_ROTATION_FACES = {'x': 'R', 'y': 'U', 'z': 'F'}
+_SUFFIX_TURNS = {'': 1, "'": 3, '2': 2}
+_TURN_SUFFIX = {1: '', 2: '2', 3: "'"}
+# Single moves in SiGN notation: R, 3R (third layer only), Rw or r (two outer
+# layers), 3Rw or 3r (three outer layers), M/E/S, x/y/z, each with an
+# optional ' or 2.
+_MOVE_NAME = re.compile(r"(\d*)([URFDLB]w?|[urfdlb]|[MESxyz])(['2]?)$")
+_MOVE_TOKEN = re.compile(r"\s*(\d*)([URFDLB]w?|[urfdlb]|[MESxyz])(2'?|')?\s*")
+
+
+@lru_cache(maxsize=None)
+def sticker_positions(n):
+    # Sticker centers scaled by n so they stay integral: the face plane sits
+    # at ±n and the in-face coordinates are odd numbers in [-(n-1), n-1].
+    off = 2 * np.arange(n) - (n - 1)
+    pos = (n * _CENTERS[:, None, None, :]
+           + off[None, None, :, None] * _RIGHTS[:, None, None, :]
+           - off[None, :, None, None] * _UPS[:, None, None, :])
+    pos = pos.reshape(-1, 3)
+    pos.setflags(write=False)
+    return pos
+
+
+def _position_index(n, pos):
+    # Inverse of sticker_positions for an (N, 3) array of positions.
+    face = np.argmax(pos @ _CENTERS.T, axis=1)
+    j = (np.einsum('ij,ij->i', pos, _RIGHTS[face]) + n - 1) // 2
+    i = (n - 1 - np.einsum('ij,ij->i', pos, _UPS[face])) // 2
+    return (face * n + i) * n + j
+
+
+def _quarter_turn(pos, axis):
+    # Rotate positions a quarter turn clockwise as seen from the +axis side.
+    a, b = [(1, 2), (2, 0), (0, 1)][axis]
+    out = pos.copy()
+    out[:, a], out[:, b] = pos[:, b], -pos[:, a]
+    return out
+
+
+# --- Move tables ---
+# A layer turn cycles four strips of n stickers (one per side face) and, for
+# an outer layer, rotates the end face.  The strips are built directly from
+# the geometry of that one layer, so a turn costs O(n) to set up and lazy
+# cubes never need a full 6·n² table; permutations (for eager cubes, batches
+# and compiled sequences) are assembled from the strips on demand.  Tables
+# are cached by total size rather than by entry count, since they grow with
+# n and a big-cube log can name O(n) different layers per face.
+MOVE_CACHE_BYTES = 64 << 20
+
+_POSITIVE_FACES = ('R', 'U', 'F')
+_NEGATIVE_FACES = ('L', 'D', 'B')
+
+
+def _cached_bytes(value):
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, tuple):
+        return sum(_cached_bytes(v) for v in value)
+    if isinstance(value, CompiledMoves):
+        return value.perm.nbytes
+    return 0
+
+
+# Like lru_cache, but evicts least recently used entries once the cached
+# arrays add up to more than `limit` bytes; larger results aren't kept.
+def _bytes_cache(limit):
+    def decorate(fn):
+        entries = OrderedDict()
+        total = 0
+
+        @wraps(fn)
+        def cached(*args):
+            nonlocal total
+            hit = entries.get(args)
+            if hit is not None:
+                entries.move_to_end(args)
+                return hit[0]
+            value = fn(*args)
+            size = _cached_bytes(value)
+            if size <= limit:
+                entries[args] = value, size
+                total += size
+                while total > limit:
+                    total -= entries.popitem(last=False)[1][1]
+            return value
+
+        def cache_clear():
+            nonlocal total
+            entries.clear()
+            total = 0
+
+        cached.cache_clear = cache_clear
+        cached.cache_bytes = lambda: total
+        return cached
+    return decorate
+
+
+# Sticker indices of the four side strips of one layer, shape (4, n): a
+# clockwise quarter turn (seen from +axis) carries strip k onto strip k + 1.
+@_bytes_cache(MOVE_CACHE_BYTES)
+def _layer_strips(n, axis, layer):
+    e = np.eye(3, dtype=np.int64)[axis]
+    side = next(c for c in _CENTERS if not c[axis])
+    along = np.cross(side, e)
+    off = 2 * np.arange(n) - (n - 1)
+    pos = n * side + (n - 1 - 2 * layer) * e + off[:, None] * along
+    strips = np.empty((4, n), dtype=np.int32)
+    for k in range(4):
+        strips[k] = _position_index(n, pos)
+        pos = _quarter_turn(pos, axis)
+    strips.setflags(write=False)
+    return strips
+
+
+# Stickers a layer turn moves between faces, as logical dst/src index pairs
+# (state[dst] takes what was at state[src]), and the clockwise quarter turns
+# it gives each face as a whole.
+@_bytes_cache(MOVE_CACHE_BYTES)
+def _turn_strips(n, axis, layers, quarter_turns):
+    t = quarter_turns % 4
+    strips = [_layer_strips(n, axis, layer) for layer in layers]
+    if t and strips:
+        src = np.concatenate([s.ravel() for s in strips])
+        dst = np.concatenate([np.roll(s, -t, axis=0).ravel() for s in strips])
+    else:
+        src = dst = np.empty(0, dtype=np.int32)
+    turns = np.zeros(6, dtype=np.intp)
+    if 0 in layers:
+        turns[FACE_INDEX[_POSITIVE_FACES[axis]]] += t
+    if n - 1 in layers:
+        # Clockwise from +axis is counterclockwise seen from the far face.
+        turns[FACE_INDEX[_NEGATIVE_FACES[axis]]] -= t
+    turns %= 4
+    for a in (dst, src, turns):
+        a.setflags(write=False)
+    return dst, src, turns
+
+
+# Gather vector for turning the given layers (a tuple) about one axis:
+# after the move, state[k] holds what was at state[perm[k]].
+@_bytes_cache(MOVE_CACHE_BYTES)
+def layer_permutation(n, axis, layers, quarter_turns):
+    dst, src, turns = _turn_strips(n, axis, layers, quarter_turns)
+    nn = n * n
+    perm = np.arange(6 * nn, dtype=np.int32)
+    perm[dst] = src
+    ids = np.arange(nn, dtype=np.int32).reshape(n, n)
+    for k in np.flatnonzero(turns):
+        perm[k * nn:(k + 1) * nn] = (np.rot90(ids, -turns[k]) + k * nn).ravel()
+    perm.setflags(write=False)
+    return perm
+
+
+# Layers (counted from the positive side) and clockwise quarter turns for
+# turning the given 0-based layers of a face, counted from that face.
+def face_layers(n, face, layers, quarter_turns=1):
+    axis, positive = _FACE_AXES[face]
+    if not positive:
+        layers = [n - 1 - k for k in layers]
+        quarter_turns = -quarter_turns
+    return axis, tuple(sorted(layers)), quarter_turns % 4
+
+
+# SiGN name for turning `layer` of a face (1 = the face itself), or the
+# `layer` outermost layers with wide=True: ("R", 3) -> "3R", wide -> "3Rw".
+def layer_move_name(face, layer=1, turns=1, wide=False):
+    default = 2 if wide else 1
+    prefix = str(layer) if layer != default else ''
+    return prefix + face + ('w' if wide else '') + _TURN_SUFFIX[turns % 4]
+
+
+@lru_cache(maxsize=4096)
+def _resolve_move(n, move):
+    m = _MOVE_NAME.match(move)
+    if not m:
+        raise ValueError(f"unknown move: {move!r}")
+    prefix, base, suffix = m.groups()
+    turns = _SUFFIX_TURNS[suffix]
+    if base in _ROTATION_FACES:
+        layers, face = range(n), _ROTATION_FACES[base]
+    elif base in _SLICE_FACES:
+        # The middle slice at n // 2, counted from L, U and F respectively.
+        face = _SLICE_FACES[base]
+        layers = [n // 2 if base != 'E' else n - 1 - n // 2]
+    elif base.islower() or base.endswith('w'):
+        depth = int(prefix or 2)
+        layers, face = range(depth), base[0].upper()
+    else:
+        depth = int(prefix or 1)
+        layers, face = [depth - 1], base
+    if prefix and base in _ROTATION_FACES.keys() | _SLICE_FACES.keys():
+        raise ValueError(f"unknown move: {move!r}")
+    layers = list(layers)
+    if not layers or min(layers) < 0 or max(layers) >= n:
+        raise ValueError(f"move {move!r} does not fit a cube with n={n}")
+    return face_layers(n, face, layers, turns)
+
+
+def move_permutation(n, move):
+    # Gather vector (int32) for a single move such as "R", "U'", "M2", "3Rw"
+    # or "x'".  Each is one direct rotation of the affected layers.
+    return layer_permutation(n, *_resolve_move(n, move))
+
+# Split a move into the part lazy cubes need: the stickers that change
+# face (as logical dst/src index pairs) and the clockwise quarter turns
+# applied to each face as a whole.
+def move_strips(n, move):
+    return _turn_strips(n, *_resolve_move(n, move))
+
+# --- Move sequences ---
+# Split a move string such as "R U R' U'" or "RUR'U'" into single moves.
+# "X2'" is accepted as a synonym for "X2".
+def parse_moves(text):
+    moves = []
+    pos = 0
+    text = text.strip()
+    while pos < len(text):
+        m = _MOVE_TOKEN.match(text, pos)
+        if not m:
+            raise ValueError(f"cannot parse moves at {text[pos:]!r}")
+        suffix = m.group(3) or ''
+        moves.append(m.group(1) + m.group(2) + suffix[:1])
+        pos = m.end()
+    return moves
+
+
+# How a compiled sequence was built: moves and nested records, run `repeat`
+# times (negative: the inverse).  Compositions and powers only add a node,
+# so power(k) stays O(log k) however many moves it stands for.
+class _MoveRecord:
+    __slots__ = ('parts', 'repeat', 'length')
+
+    def __init__(self, parts, repeat=1):
+        self.parts = tuple(parts)
+        self.repeat = repeat
+        self.length = abs(repeat) * sum(1 if isinstance(p, str) else p.length for p in self.parts)
+
+    # The moves one by one, walked with an explicit stack so deep chains of
+    # then() don't hit the recursion limit.
+    def __iter__(self):
+        stack = [(self, False, abs(self.repeat))]
+        while stack:
+            node, inverted, times = stack.pop()
+            if isinstance(node, str):
+                yield invert_move(node) if inverted else node
+                continue
+            if not times:
+                continue
+            if times > 1:
+                stack.append((node, inverted, times - 1))
+            inverted ^= node.repeat < 0
+            for part in (node.parts if inverted else reversed(node.parts)):
+                stack.append((part, inverted, 1 if isinstance(part, str) else abs(part.repeat)))
+
+
+# A whole move sequence folded into one permutation of sticker indices, so it
+# can be applied to any cube (or batch) of the same size with one gather.
+class CompiledMoves:
+    def __init__(self, n, perm, moves=()):
+        self.n = n
+        self.perm = perm
+        self._record = moves if isinstance(moves, _MoveRecord) else _MoveRecord(moves)
+
+    def __len__(self):
+        return self._record.length
+
+    # The moves spelled out; len(self) entries, however they were composed.
+    @property
+    def moves(self):
+        return tuple(self._record)
+
+    def apply(self, cube):
+        if cube.n != self.n:
+            raise ValueError(f"compiled for n={self.n}, got a cube with n={cube.n}")
+        if isinstance(cube, CubeBatch):
+            cube.states = cube.states[:, self.perm]
+        else:
+            cube.state = cube.state[self.perm]
+
+    # Running self and then other.
+    def then(self, other):
+        perm = self.perm[other.perm]
+        perm.setflags(write=False)
+        return CompiledMoves(self.n, perm, _MoveRecord((self._record, other._record)))
+
+    def inverse(self):
+        perm = np.empty_like(self.perm)
+        perm[self.perm] = np.arange(len(perm))
+        perm.setflags(write=False)
+        return CompiledMoves(self.n, perm, _MoveRecord((self._record,), -1))
+
+    # The sequence repeated k times (k < 0 repeats the inverse), by squaring.
+    def power(self, k):
+        base = self.perm
+        if k < 0:
+            base = np.empty_like(self.perm)
+            base[self.perm] = np.arange(len(base))
+        perm = _identity(self.n)
+        remaining = abs(k)
+        while remaining:
+            if remaining & 1:
+                perm = perm[base]
+            remaining >>= 1
+            if remaining:
+                base = base[base]
+        perm.setflags(write=False)
+        return CompiledMoves(self.n, perm, _MoveRecord((self._record,), k))
+
+
+    # --- Cycle analysis ---
+    # Each sticker labeled with the smallest index in its cycle, found by
+    # pointer doubling: after k rounds a label covers 2^k steps of the cycle,
+    # so this takes O(m log(longest cycle)) for m stickers.  The labels
+    # aren't kept: compiled sequences sit in a cache bounded by the size of
+    # their permutations.
+    def cycle_labels(self):
+        labels = np.arange(len(self.perm), dtype=self.perm.dtype)
+        jump = np.asarray(self.perm)
+        while True:
+            merged = np.minimum(labels, labels[jump])
+            if (merged == labels).all():
+                return labels
+            labels, jump = merged, jump[jump]
+
+    # Sticker cycles as arrays of sticker indices (each in increasing order),
+    # longest first; fixed stickers are left out.
+    def cycles(self):
+        labels = self.cycle_labels()
+        order = np.argsort(labels, kind='stable')
+        _, starts = np.unique(labels[order], return_index=True)
+        groups = np.split(order, starts[1:])
+        return sorted((g for g in groups if len(g) > 1), key=len, reverse=True)
+
+    # {cycle length: number of cycles}, fixed stickers counting as 1-cycles.
+    def cycle_type(self):
+        lengths = np.bincount(self.cycle_labels())
+        values, counts = np.unique(lengths[lengths > 0], return_counts=True)
+        return dict(zip(values.tolist(), counts.tolist()))
+
+    # Repetitions that bring every sticker back to where it started.  Cubes
+    # whose stickers share colors (such as big-cube centers) can look solved
+    # sooner.
+    def order(self):
+        return math.lcm(*self.cycle_type())
+
+    def fixed_stickers(self):
+        return np.flatnonzero(self.perm == np.arange(len(self.perm)))
+
+
+def split_move(move):
+    # "3Rw'" -> ("3Rw", "'"); the suffix is '', "'" or '2'.
+    if move[-1:] in ("'", '2') and len(move) > 1:
+        return move[:-1], move[-1]
+    return move, ''
+
+
+_INVERSE_SUFFIX = {'': "'", "'": '', '2': '2'}
+
+
+def invert_move(move):
+    body, suffix = split_move(move)
+    return body + _INVERSE_SUFFIX[suffix]
+
+
+def invert_moves(moves):
+    return tuple(map(invert_move, reversed(moves)))
+
+
+@lru_cache(maxsize=None)
+def _identity(n):
+    perm = np.arange(6 * n * n, dtype=np.int32)
+    perm.setflags(write=False)
+    return perm
+
+
+@_bytes_cache(MOVE_CACHE_BYTES)
+def _compile(n, moves):
+    perm = _identity(n)
+    for move in moves:
+        perm = perm[move_permutation(n, move)]
+    perm.setflags(write=False)
+    return CompiledMoves(n, perm, moves)
+
+
+# Compile a move string (or an iterable of basic moves) for cubes of size n.
+# Results are cached (up to MOVE_CACHE_BYTES), so recompiling the same
+# algorithm is free.
+def compile_moves(n, moves):
+    if isinstance(moves, CompiledMoves):
+        return moves
+    if isinstance(moves, str):
+        moves = parse_moves(moves)
+    return _compile(n, tuple(moves))
+
+# --- Move simplification ---
+# Moves about the same axis commute, so a run of them only amounts to a net
+# number of quarter turns per layer: "U U U" is U', "R L R" is R2 L and
+# "F F F F" is nothing.  MoveSimplifier keeps such runs per axis and, when a
+# run cancels out entirely, resumes merging into the run before it
+# ("R U U' R" is R2).  Released runs are written back with as few names as
+# the notation allows, and never with more than the moves they replace.
+@lru_cache(maxsize=None)
+def _layer_names(n, axis):
+    faces = [f for f, (a, _) in _FACE_AXES.items() if a == axis]
+    candidates = [r for r, f in _ROTATION_FACES.items() if f in faces]
+    candidates += faces + [s for s, f in _SLICE_FACES.items() if f in faces]
+    candidates += [layer_move_name(f, d, wide=True) for f in faces for d in range(2, n)]
+    candidates += [layer_move_name(f, d) for f in faces for d in range(2, n)]
+    names = {}
+    for name in candidates:
+        try:
+            _, layers, turns = _resolve_move(n, name)
+        except ValueError:
+            continue
+        # turns is 1 or 3, so it is its own inverse mod 4.
+        names.setdefault(layers, (name, turns))
+    return names
+
+
+_NEVER = 1 << 30
+
+
+# The fewest moves for per-layer turns given as (turns, layer count)
+# segments: a rotation by r, then per segment the turns p of the prefixes
+# and s of the suffixes covering it, plus a single-layer move for each
+# layer that p + s + r leaves wrong.  Prefix and suffix amounts only change
+# between segments, since moving a change inside a segment to one of its
+# ends never costs more.  Returns (r, [(p, s) per segment]).
+@lru_cache(maxsize=4096)
+def _plan_run(segments):
+    best = None
+    for r in range(4):
+        # cost[p][s] of the cheapest plan up to the current segment; no
+        # suffix can cover the first layer (that would be the rotation).
+        turns, count = segments[0]
+        cost = [[count * ((p + r - turns) % 4 != 0) if s == 0 else _NEVER for s in range(4)]
+                for p in range(4)]
+        back = []
+        for turns, count in segments[1:]:
+            # Changing p and changing s each cost one move, so the cheapest
+            # predecessor is found one coordinate at a time.
+            from_p = [[p if cost[p][s] <= min(cost[q][s] for q in range(4)) + 1 else
+                       min(range(4), key=lambda q: cost[q][s]) for s in range(4)] for p in range(4)]
+            mid = [[cost[from_p[p][s]][s] + (from_p[p][s] != p) for s in range(4)] for p in range(4)]
+            from_s = [[s if mid[p][s] <= min(mid[p]) + 1 else
+                       min(range(4), key=mid[p].__getitem__) for s in range(4)] for p in range(4)]
+            cost = [[mid[p][from_s[p][s]] + (from_s[p][s] != s) + count * ((p + s + r - turns) % 4 != 0)
+                     for s in range(4)] for p in range(4)]
+            back.append((from_p, from_s))
+        # Nor can a prefix cover the last layer.
+        s = min(range(4), key=cost[0].__getitem__)
+        total = cost[0][s] + (r != 0)
+        if best is None or total < best[0]:
+            states = [(0, s)]
+            for from_p, from_s in reversed(back):
+                p, s = states[-1]
+                s = from_s[p][s]
+                states.append((from_p[p][s], s))
+            best = total, r, states[::-1]
+    return best[1:]
+
+
+# (first layer, layers, quarter turns) per move of _plan_run's plan.
+def _planned_parts(n, turns):
+    starts = [0] + [k for k in range(1, n) if turns[k] != turns[k - 1]]
+    segments = tuple((turns[a], b - a) for a, b in zip(starts, starts[1:] + [n]))
+    r, states = _plan_run(segments)
+    parts = [(0, tuple(range(n)), r)] if r else []
+    for j, (a, (p, s)) in enumerate(zip(starts, states)):
+        if j:
+            prev_p, prev_s = states[j - 1]
+            parts.append((0, tuple(range(a)), prev_p - p))
+            parts.append((a, tuple(range(a, n)), s - prev_s))
+        extra = turns[a] - p - s - r
+        if extra % 4:
+            end = starts[j + 1] if j + 1 < len(starts) else n
+            parts += [(k, (k,), extra) for k in range(a, end)]
+    return parts
+
+
+# Every name turns the whole axis, a prefix of its layers (a face or wide
+# move from the positive side), a suffix (from the negative side) or a
+# single layer.  Seen through the steps e[k] = turns[k] - turns[k - 1] at
+# the n + 1 cuts between layers (with no turns outside the cube), each
+# such move shifts an amount between two cuts: a prefix between cut 0 and
+# cut d, a suffix between cut d and cut n, layer k between cuts k and
+# k + 1, and a rotation between cuts 0 and n.  The moves for a turn vector
+# link its nonzero cuts into groups that each sum to zero, at one move
+# fewer than the cuts in each group, so the fewest moves come from:
+#   - as many zero-sum stretches of consecutive nonzero inner cuts as
+#     possible, each turned as single layers;
+#   - every other inner cut joined to cut 0 or cut n as a prefix or suffix;
+#   - a rotation only when cuts 0 and n both step and the rest can't be
+#     split into a part cancelling each.
+# Other choices of stretches can leave cuts that do split, so when a
+# rotation would follow some stretches the run is planned layer by layer
+# with _plan_run instead.  Returns a tuple of move names.
+def _fewest_moves(n, axis, turns):
+    steps = [turns[0] % 4] + [(turns[k] - turns[k - 1]) % 4 for k in range(1, n)] + [-turns[-1] % 4]
+    # (first layer, layers, quarter turns) per move.
+    parts = []
+    loose = []    # inner cuts left for cut 0 or cut n
+    pending = []  # cuts since the last stretch or zero step
+    reached = {0: 0}
+    total = 0
+    for k in range(1, n):
+        if not steps[k]:
+            loose += pending
+            pending, reached, total = [], {0: k}, 0
+            continue
+        total = (total + steps[k]) % 4
+        if total not in reached:
+            reached[total] = k
+            pending.append(k)
+            continue
+        # Cuts after reached[total] up to k sum to zero: turn the layers
+        # between them one by one.
+        start = reached[total]
+        loose += [c for c in pending if c <= start]
+        amount = 0
+        for layer in range(start + 1, k):
+            amount += steps[layer]
+            parts.append((layer, (layer,), amount))
+        pending, reached, total = [], {0: k}, 0
+    loose += pending
+
+    first, last = steps[0], steps[n]
+    to_first = set(loose)
+    if first and last:
+        # A subset of the loose cuts cancelling cut 0's step, by its sums mod 4.
+        sums = {0: None}
+        for i, c in enumerate(loose):
+            for total in list(sums):
+                sums.setdefault((total + steps[c]) % 4, (total, i))
+        target = -first % 4
+        if target in sums:
+            to_first = set()
+            while sums[target]:
+                target, i = sums[target]
+                to_first.add(loose[i])
+        elif parts:
+            parts, loose = _planned_parts(n, turns), []
+        else:
+            parts.append((0, tuple(range(n)), -last))
+    elif last:
+        to_first = set()
+    for c in loose:
+        if c in to_first:
+            parts.append((0, tuple(range(c)), -steps[c]))
+        else:
+            parts.append((c, tuple(range(c, n)), steps[c]))
+
+    names = _layer_names(n, axis)
+    moves = []
+    for _, layers, t in sorted(parts, key=lambda part: (part[0], -len(part[1]))):
+        if t % 4:
+            name, unit = names[layers]
+            moves.append(name + _TURN_SUFFIX[t * unit % 4])
+    return tuple(moves)
+
+
+# Cube sizes whose runs are named through a cache.
+CACHED_RUNS_UP_TO = 16
+_fewest_moves_cached = lru_cache(maxsize=4096)(_fewest_moves)
+
+
+# Moves for a net per-layer turn vector (layers counted from the positive
+# side).  Small cubes see the same few vectors over and over, so theirs are
+# cached; on big cubes the keys alone would take up too much room.
+def _run_moves(n, axis, turns):
+    if n <= CACHED_RUNS_UP_TO:
+        return _fewest_moves_cached(n, axis, tuple(turns))
+    return _fewest_moves(n, axis, turns)
+
+
+class MoveSimplifier:
+    # hold: how many axis runs to keep back before releasing the oldest from
+    # push(); None keeps everything until flush().
+    def __init__(self, n, hold=None):
+        self.n = n
+        self.hold = hold
+        self._runs = []   # [axis, per-layer quarter turns]; neighbours differ in axis
+
+    # Feed one move; returns the moves released by it.
+    def push(self, move):
+        axis, layers, turns = _resolve_move(self.n, move)
+        if not self._runs or self._runs[-1][0] != axis:
+            self._runs.append((axis, [0] * self.n))
+        run = self._runs[-1][1]
+        for k in layers:
+            run[k] = (run[k] + turns) % 4
+        if not any(run):
+            self._runs.pop()
+        released = []
+        while self.hold is not None and len(self._runs) > self.hold:
+            released += _run_moves(self.n, *self._runs.pop(0))
+        return released
+
+    def extend(self, moves):
+        if isinstance(moves, str):
+            moves = parse_moves(moves)
+        released = []
+        for move in moves:
+            released += self.push(move)
+        return released
+
+    # The simplified moves still held back, without releasing them.
+    def pending(self):
+        return [m for axis, turns in self._runs for m in _run_moves(self.n, axis, turns)]
+
+    def flush(self):
+        moves = self.pending()
+        self._runs = []
+        return moves
+
+    # Release everything held back into a cube.
+    def apply(self, cube):
+        for move in self.flush():
+            cube.apply_move(move)
+
+
+def simplify_moves(n, moves):
+    simplifier = MoveSimplifier(n)
+    simplifier.extend(moves)
+    return simplifier.flush()
+
+
+# Shortest name for turning one layer (counted from the positive side of the
+# axis) by quarter turns clockwise as seen from that side.
+def axis_move_name(n, axis, layer, turns):
+    vector = [0] * n
+    vector[layer] = turns % 4
+    return ' '.join(_run_moves(n, axis, vector))
+
+# --- Undo/redo ---
+# Moves applied to a cube through a history can be undone (by applying
+# their inverses) and redone.  Applying new moves drops the redo list.
+# mark() and rewind(mark) undo back to a point, so a search can try a line
+# and back out of it at the cost of the moves made, not of copying the cube.
+# With a limit only the newest `limit` moves can be undone.
+class MoveHistory:
+    def __init__(self, cube, limit=None):
+        self.cube = cube
+        self._done = deque(maxlen=limit)
+        self._undone = []
+        # Moves applied since the start, net of undos.
+        self._count = 0
+
+    def apply(self, moves):
+        if isinstance(moves, str):
+            moves = parse_moves(moves)
+        for move in moves:
+            self.cube.apply_move(move)
+            self._done.append(move)
+            self._count += 1
+        if moves:
+            self._undone.clear()
+
+    # Undo up to `steps` moves; returns the moves undone, newest first.
+    def undo(self, steps=1):
+        moves = [self._done.pop() for _ in range(min(steps, len(self._done)))]
+        for move in invert_moves(moves[::-1]):
+            self.cube.apply_move(move)
+        self._undone.extend(moves)
+        self._count -= len(moves)
+        return moves
+
+    # Redo up to `steps` undone moves; returns the moves redone.
+    def redo(self, steps=1):
+        moves = [self._undone.pop() for _ in range(min(steps, len(self._undone)))]
+        for move in moves:
+            self.cube.apply_move(move)
+            self._done.append(move)
+        self._count += len(moves)
+        return moves
+
+    def can_undo(self):
+        return bool(self._done)
+
+    def can_redo(self):
+        return bool(self._undone)
+
+    def mark(self):
+        return self._count
+
+    def rewind(self, mark):
+        back = self._count - mark
+        if back < 0 or back > len(self._done):
+            raise ValueError(f"mark {mark} is not in the undo history")
+        return self.undo(back)
+
+
+# --- Compact encoding and hashing ---
+# pack_state stores each sticker in 3 bits (colors are 0..5), most
+# significant bit first; Cube.to_bytes prefixes that with n.
+def pack_state(state):
+    bits = (np.asarray(state, dtype=np.uint8)[:, None] >> np.array([2, 1, 0], dtype=np.uint8)) & 1
+    return np.packbits(bits).tobytes()
+
+
+def unpack_state(data, n):
+    count = 6 * n * n
+    if len(data) != (3 * count + 7) // 8:
+        raise ValueError(f"need {(3 * count + 7) // 8} bytes for n={n}, got {len(data)}")
+    bits = np.unpackbits(np.frombuffer(data, dtype=np.uint8), count=3 * count)
+    state = bits.reshape(count, 3) @ np.array([4, 2, 1], dtype=np.uint8)
+    if (state > 5).any():
+        raise ValueError("sticker color out of range")
+    return state.astype(np.uint8)
+
+
+# Zobrist keys: one random 64-bit word per (sticker, color).  The generator
+# is seeded with n, so hashes agree across processes and runs.
+@lru_cache(maxsize=None)
+def zobrist_keys(n):
+    rng = np.random.default_rng(n)
+    return np.frombuffer(rng.bytes(8 * 6 * 6 * n * n), dtype=np.uint64).reshape(6 * n * n, 6)
+
+
+def zobrist_hash(n, state):
+    keys = zobrist_keys(n)
+    return int(np.bitwise_xor.reduce(keys[np.arange(len(state)), state]))
+
+
+# Logical cell (within its face) that each stored cell holds while the face
+# has 0..3 pending clockwise quarter turns, shape (4, n²): the inverse of
+# Cube._physical.
+@_bytes_cache(MOVE_CACHE_BYTES)
+def _logical_cells(n):
+    i, j = np.divmod(np.arange(n * n), n)
+    out = np.empty((4, n * n), dtype=np.int64)
+    for r in range(4):
+        out[r] = i * n + j
+        i, j = j, n - 1 - i
+    out.setflags(write=False)
+    return out
+
+# _ROLL[t][r] = (r + t) % 4: a face turned t more times reads its hash for
+# pending rotation r from entry r + t.
+_ROLL = (np.arange(4)[None, :] + np.arange(4)[:, None]) % 4
+
+
+# --- Symmetries ---
+# The 48 symmetries of the cube as signed 3×3 permutation matrices: the 24
+# rotations first (identity at 0), then the same rotations after a left-right
+# mirror.  A symmetry moves each sticker to m·p and, with relabel=True, also
+# renames colors after the face they were carried to, so the solved cube maps
+# to itself and states that differ only by a symmetry (colors read relative
+# to the home faces) map to one another.
+@lru_cache(maxsize=None)
+def symmetry_matrices():
+    rotations = []
+    for axes in itertools.permutations(range(3)):
+        for signs in itertools.product((1, -1), repeat=3):
+            m = np.zeros((3, 3), dtype=np.int64)
+            m[range(3), axes] = signs
+            if round(np.linalg.det(m)) == 1:
+                rotations.append(m)
+    mirror = np.diag([-1, 1, 1])
+    mats = np.array(rotations + [r @ mirror for r in rotations])
+    mats.setflags(write=False)
+    return mats
+
+
+# Per symmetry s: the gather vector perms[s], the color relabeling colors[s]
+# and the index of the inverse symmetry inverse[s].  The tables take
+# 48·6n² int32 entries, so they share the move tables' byte bound.
+@_bytes_cache(MOVE_CACHE_BYTES)
+def symmetry_tables(n):
+    mats = symmetry_matrices()
+    pos = sticker_positions(n)
+    perms = np.empty((len(mats), len(pos)), dtype=np.int32)
+    colors = np.empty((len(mats), 6), dtype=np.uint8)
+    inverse = np.empty(len(mats), dtype=np.intp)
+    for s, m in enumerate(mats):
+        # The sticker now at p came from m⁻¹·p = mᵀ·p, i.e. the row p @ m.
+        perms[s] = _position_index(n, pos @ m)
+        colors[s] = np.argmax((_CENTERS @ m.T) @ _CENTERS.T, axis=1)
+        inverse[s] = next(t for t, other in enumerate(mats) if (other == m.T).all())
+    for a in (perms, colors, inverse):
+        a.setflags(write=False)
+    return perms, colors, inverse
+
+
+def transform_state(n, state, sym, relabel=True):
+    perms, colors, _ = symmetry_tables(n)
+    out = state[perms[sym]]
+    return colors[sym][out] if relabel else out
+
+
+# Lexicographically smallest image of a state under the 24 rotations (or all
+# 48 symmetries); returns it with the symmetry that produced it.  Ties go to
+# the lowest symmetry index.  transform_state(n, image, inverse[sym]) gives
+# back the original state.
+def canonical_state(n, state, mirrors=False, relabel=True):
+    perms, colors, _ = symmetry_tables(n)
+    count = len(perms) if mirrors else len(perms) // 2
+    images = state[perms[:count]]
+    if relabel:
+        images = colors.ravel()[6 * np.arange(count)[:, None] + images]
+    # Rows viewed as fixed-width byte strings compare lexicographically.
+    sym = int(np.argmin(np.ascontiguousarray(images).view(f'S{images.shape[1]}').ravel()))
+    return images[sym], sym
+
+# --- Cube state class ---
+# Eager cubes below this size apply a move as one gather through its cached
+# permutation; bigger ones copy the stickers and move only the strips and
+# turned faces, which is faster than a 6·n² gather from about n=32.
+EAGER_GATHER_BELOW = 32
+# From this size the Zobrist hash is kept up to date move by move; smaller
+# cubes rehash all stickers when asked, which is cheaper than the upkeep.
+INCREMENTAL_HASH_FROM = 32
+
+class Cube:
+    # With lazy=True a face turn only cycles the 4n edge stickers; the turned
+    # face itself just records a pending rotation and is brought up to date
+    # the next time the stickers are read.
+    def __init__(self, n, lazy=False):
+        self.n = n
+        self.lazy = lazy
+        # Every sticker starts on its home face.
+        self._state = np.repeat(np.arange(6, dtype=np.uint8), n * n)
+        # Pending clockwise quarter turns per face (lazy mode only).
+        self._orient = np.zeros(6, dtype=np.intp)
+        # Bumped on every change to the stickers, so views can tell whether
+        # anything needs redrawing.
+        self.version = 0
+        # Zobrist hash of the stickers, cached until the next change.
+        self._hash = None
+        # From INCREMENTAL_HASH_FROM: the hash per face as stored, under each
+        # of the 4 rotations the face could have pending: _face_hash[k, r].
+        # The cube's hash is the XOR of _face_hash[k, orientation of k], so a
+        # face turn changes no entry (lazy) or just rotates a row (eager),
+        # and a move only updates the stickers that change face.  Computed
+        # on first use.
+        self._face_hash = None
+        # Whether _state may be shared with a snapshot (see snapshot()).
+        self._shared = False
+
+    @property
+    def state(self):
+        if self._orient.any():
+            self._materialize()
+        return self._state
+
+    @state.setter
+    def state(self, value):
+        self._state = value
+        self._orient[:] = 0
+        self.version += 1
+        self._hash = self._face_hash = None
+        self._shared = False
+
+    # Nested-list view of the stickers, keyed by face letter.
+    @property
+    def faces(self):
+        n = self.n
+        rows = FACE_LETTERS[self.state].reshape(6, n, n).tolist()
+        return dict(zip(FACES, rows))
+
+    def face(self, name):
+        n = self.n
+        k = FACE_INDEX[name]
+        return self.state[k * n * n:(k + 1) * n * n].reshape(n, n)
+
+    def apply_move(self, move):
+        self.version += 1
+        self._hash = None
+        n, nn = self.n, self.n * self.n
+        dst, src, turns = move_strips(n, move)
+        if not self.lazy:
+            old = self._state
+            if n < EAGER_GATHER_BELOW:
+                self._state = old[move_permutation(n, move)]
+            else:
+                # Strips move between faces, turned faces rotate as a block.
+                s = old.copy()
+                s[dst] = old[src]
+                for k in np.flatnonzero(turns):
+                    face = slice(k * nn, (k + 1) * nn)
+                    s[face] = np.rot90(old[face].reshape(n, n), -turns[k]).ravel()
+                self._state = s
+            self._shared = False
+            if self._face_hash is not None:
+                self._rehash_cells(dst, old[dst])
+                self._face_hash = self._face_hash[np.arange(6)[:, None], _ROLL[turns]]
+        else:
+            self._own()
+            s = self._state
+            dst = self._physical(dst)
+            before = s[dst] if self._face_hash is not None else None
+            s[dst] = s[self._physical(src)]
+            self._orient = (self._orient + turns) % 4
+            if self._face_hash is not None:
+                self._rehash_cells(dst, before)
+
+    # Swap the Zobrist keys of stored cells that changed from `before` to
+    # their current colors.
+    def _rehash_cells(self, cells, before):
+        nn = self.n * self.n
+        face, cell = np.divmod(cells, nn)
+        logical = _logical_cells(self.n)[:, cell] + face * nn
+        keys = zobrist_keys(self.n)
+        delta = keys[logical, before] ^ keys[logical, self._state[cells]]
+        np.bitwise_xor.at(self._face_hash.reshape(-1), face * 4 + np.arange(4)[:, None], delta)
+
+    # Map logical sticker indices to where they are stored while faces have
+    # pending rotations: logical (i, j) sits at physical (n-1-j, i) per turn.
+    def _physical(self, idx):
+        if not self._orient.any():
+            return idx
+        n = self.n
+        face, rem = np.divmod(idx, n * n)
+        i, j = np.divmod(rem, n)
+        r = self._orient[face]
+        for t in range(1, 4):
+            sel = r >= t
+            i[sel], j[sel] = n - 1 - j[sel], i[sel]
+        return (face * n + i) * n + j
+
+    def _materialize(self):
+        self._own()
+        n = self.n
+        faces = self._state.reshape(6, n, n)
+        for k in np.flatnonzero(self._orient):
+            faces[k] = np.rot90(faces[k], -self._orient[k]).copy()
+        if self._face_hash is not None:
+            self._face_hash = self._face_hash[np.arange(6)[:, None], _ROLL[self._orient]]
+        self._orient[:] = 0
+
+    # --- Snapshots ---
+    # A snapshot is an independent cube that shares this cube's sticker
+    # array until one of them writes to it, so taking one costs O(1).
+    # Eager moves build a new array anyway and never copy; a lazy cube
+    # copies the array once, on its first move after the snapshot.
+    # restore() shares a snapshot's stickers back the same way, so
+    # snapshot/restore pairs suit branching search on any cube size.
+    def snapshot(self):
+        cube = object.__new__(Cube)
+        cube.__dict__.update(self.__dict__)
+        cube._orient = self._orient.copy()
+        if self._face_hash is not None:
+            cube._face_hash = self._face_hash.copy()
+        self._shared = cube._shared = True
+        return cube
+
+    def restore(self, snapshot):
+        if snapshot.n != self.n:
+            raise ValueError(f"snapshot has n={snapshot.n}, cube has n={self.n}")
+        self._state = snapshot._state
+        self._orient = snapshot._orient.copy()
+        self._hash = snapshot._hash
+        self._face_hash = None if snapshot._face_hash is None else snapshot._face_hash.copy()
+        self.version += 1
+        self._shared = snapshot._shared = True
+        # Eager moves ignore pending face turns, so a lazy snapshot's are
+        # carried out on this cube's own copy.
+        if not self.lazy and self._orient.any():
+            self._materialize()
+
+    # Take a private copy of the stickers before writing to them in place.
+    def _own(self):
+        if self._shared:
+            self._state = self._state.copy()
+            self._shared = False
+
+    # Turn layer `layer` (1 = the face itself) of a face, or with wide=True
+    # all layers from the face down to `layer`.  Equivalent to the SiGN
+    # moves "3R" and "3Rw" for layer=3.
+    def turn(self, face, layer=1, turns=1, wide=False):
+        if turns % 4:
+            self.apply_move(layer_move_name(face, layer, turns, wide))
+
+    # Whole-cube rotation about 'x', 'y' or 'z'.
+    def rotate(self, axis, turns=1):
+        if turns % 4:
+            self.apply_move(axis + _TURN_SUFFIX[turns % 4])
+
+    # Apply a whole sequence ("R U R' U'" or a CompiledMoves) with one gather.
+    def apply(self, moves):
+        compile_moves(self.n, moves).apply(self)
+
+    # Solved means every face is a single color, whatever the orientation.
+    # Pending face rotations cannot change that, so skip materializing.
+    def is_solved(self):
+        faces = self._state.reshape(6, -1)
+        return bool((faces == faces[:, :1]).all())
+
+    # --- Hashing, comparison and serialization ---
+    # Cubes compare and hash by size and stickers, so they can key dicts and
+    # sets; don't turn a cube while it is stored in one.  Editing the state
+    # array in place (rather than assigning cube.state) bypasses the hash.
+    @property
+    def zobrist(self):
+        if self._hash is not None:
+            return self._hash
+        if self.n < INCREMENTAL_HASH_FROM:
+            self._hash = zobrist_hash(self.n, self.state)
+            return self._hash
+        if self._face_hash is None:
+            nn = self.n * self.n
+            logical = np.tile(_logical_cells(self.n), 6) + np.repeat(np.arange(6) * nn, nn)
+            keys = zobrist_keys(self.n)[logical, self._state].reshape(4, 6, nn)
+            self._face_hash = np.bitwise_xor.reduce(keys, axis=2).T.copy()
+        self._hash = int(np.bitwise_xor.reduce(self._face_hash[np.arange(6), self._orient]))
+        return self._hash
+
+    def __eq__(self, other):
+        if not isinstance(other, Cube):
+            return NotImplemented
+        return self.n == other.n and np.array_equal(self.state, other.state)
+
+    def __hash__(self):
+        return self.zobrist
+
+    # n as two big-endian bytes, then the stickers at 3 bits each.
+    def to_bytes(self):
+        return self.n.to_bytes(2, 'big') + pack_state(self.state)
+
+    @classmethod
+    def from_bytes(cls, data, lazy=False):
+        cube = cls(int.from_bytes(data[:2], 'big'), lazy)
+        cube.state = unpack_state(data[2:], cube.n)
+        return cube
+
+    # Symmetry-reduced key: to_bytes() of the smallest image of this cube
+    # under the rotations (and mirrors), plus the symmetry applied.  Map
+    # back with Cube.from_bytes(key).transformed(symmetry_tables(n)[2][sym]).
+    def canonical(self, mirrors=False, relabel=True):
+        image, sym = canonical_state(self.n, self.state, mirrors, relabel)
+        return self.n.to_bytes(2, 'big') + pack_state(image), sym
+
+    def transformed(self, sym, relabel=True):
+        cube = Cube(self.n, self.lazy)
+        cube.state = transform_state(self.n, self.state, sym, relabel)
+        return cube
+
+    # Dump the cube as text; built as one string and written once.
+    def print_cube(self, move="", file=None):
+        lines = [f"\nPerformed move: {move}" if move else "\nCube state:"]
+        for face, rows in self.faces.items():
+            lines.append(f"{face} face:")
+            lines.extend("  " + " ".join(row) for row in rows)
+        lines.append("-" * 30)
+        print("\n".join(lines), file=file or sys.stdout)
+
+    # --- Standard face moves (clockwise) ---
+    # Each move is a single gather through a cached permutation vector.
+    def move_F(self): self.apply_move('F')
+    def move_B(self): self.apply_move('B')
+    def move_L(self): self.apply_move('L')
+    def move_R(self): self.apply_move('R')
+    def move_U(self): self.apply_move('U')
+    def move_D(self): self.apply_move('D')
+
+    # --- Inverse moves (counterclockwise) ---
+    def move_F_cc(self): self.apply_move("F'")
+    def move_B_cc(self): self.apply_move("B'")
+    def move_L_cc(self): self.apply_move("L'")
+    def move_R_cc(self): self.apply_move("R'")
+    def move_U_cc(self): self.apply_move("U'")
+    def move_D_cc(self): self.apply_move("D'")
+
+    # --- Middle slice moves ---
+    # M: the middle vertical slice, turning like L (affects U, F, D, B)
+    # E: the equatorial slice, turning like D (affects F, R, B, L)
+    # S: the standing slice, turning like F (affects U, R, D, L)
+    # On even n these turn the slice at n // 2 counted from L, U and F.
+    def move_M(self): self.apply_move('M')
+    def move_M_cc(self): self.apply_move("M'")
+    def move_E(self): self.apply_move('E')
+    def move_E_cc(self): self.apply_move("E'")
+    def move_S(self): self.apply_move('S')
+    def move_S_cc(self): self.apply_move("S'")
+
+# --- Batched cube states ---
+# Many independent cubes of the same size, one per row of a
+# (batch, 6·n²) array, stepped together with vectorized gathers.
+class CubeBatch:
+    def __init__(self, n, size):
+        self.n = n
+        self.states = np.tile(Cube(n).state, (size, 1))
+
+    @classmethod
+    def from_cubes(cls, cubes):
+        cubes = list(cubes)
+        batch = cls(cubes[0].n, 0)
+        batch.states = np.stack([c.state for c in cubes])
+        return batch
+
+    def __len__(self):
+        return len(self.states)
+
+    def cube(self, k):
+        c = Cube(self.n)
+        c.state = self.states[k].copy()
+        return c
+
+    # Apply the same move to every cube.
+    def apply_move(self, move):
+        self.states = self.states[:, move_permutation(self.n, move)]
+
+    # Apply the same sequence to every cube with one gather.
+    def apply(self, moves):
+        compile_moves(self.n, moves).apply(self)
+
+    # Apply moves[k] to cube k.  Each distinct move is looked up once and the
+    # whole batch is permuted with a single take_along_axis.
+    def apply_moves(self, moves):
+        names, which = np.unique(np.asarray(moves), return_inverse=True)
+        if len(which) != len(self.states):
+            raise ValueError(f"expected {len(self.states)} moves, got {len(which)}")
+        table = np.stack([move_permutation(self.n, str(m)) for m in names])
+        self.states = np.take_along_axis(self.states, table[which], axis=1)
+
+    def zobrist(self):
+        keys = zobrist_keys(self.n)
+        return np.bitwise_xor.reduce(keys[np.arange(self.states.shape[1]), self.states], axis=1)
+
+    def is_solved(self):
+        faces = self.states.reshape(len(self.states), 6, -1)
+        return (faces == faces[:, :, :1]).all(axis=(1, 2))
+
+    # Row-wise equality against another batch of the same size, or against a
+    # single Cube broadcast over the batch.
+    def equals(self, other):
+        if isinstance(other, Cube):
+            other_states = other.state[None, :]
+        else:
+            other_states = other.states
+        return (self.states == other_states).all(axis=1)
@@ -0,0 +1,163 @@
+import os, sys, time, argparse
+from collections import deque
+from contextlib import nullcontext
+from multiprocessing import Pool
+from rcube_core import Cube
+from rcube_replay import read_chunks, read_batches
+
+# --- Offscreen batch rendering of replays ---
+#     python rcube_render.py solves/*.txt -o frames --image-size 320x240 --spin 2
+#     python rcube_render.py solves/*.txt -o thumbs --view net --final
+# Every input is a move log (as read by rcube_replay); its frames - the
+# cube before the first move and after every --every moves - go to
+# <output>/<input name>/<frame>.png, or <output>/<input name>.png with
+# --final.  Stdin is named "stdin", and inputs sharing a name get -2, -3...
+# appended.  The main process replays the moves and sends packed cube
+# states in runs of consecutive frames to a process pool, which renders and
+# writes the PNGs; at most a few runs per worker are in flight, so memory
+# stays flat however many frames there are.  Throughput is reported as
+# frames/sec overall and per worker process.
+
+FRAMES_PER_TASK = 32
+
+
+# --- Worker side ---
+def _init_worker(view, size, camera, spin, cell_size):
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+    global _view, _size, _camera, _spin, _cell_size
+    _view, _size, _camera, _spin, _cell_size = view, size, camera, spin, cell_size
+
+
+# Render one run of (path, frame number, packed cube) frames; returns how
+# many were written.
+def _render(frames):
+    import pygame
+    if _view == 'net':
+        from rcube3 import render_net
+    else:
+        from rcube3d import render_cube, FaceMesher
+        mesher = FaceMesher()
+        surface = pygame.Surface(_size)
+    for path, frame, data in frames:
+        cube = Cube.from_bytes(data)
+        if _view == 'net':
+            surface = render_net(cube, _cell_size)
+        else:
+            rot_x, rot_y, viewer_distance = _camera
+            render_cube(cube, rot_x, rot_y + _spin * frame, viewer_distance,
+                        mesher=mesher, surface=surface)
+        pygame.image.save(surface, path)
+    return len(frames)
+
+
+# --- Frame source ---
+def _input_name(input_path):
+    return 'stdin' if input_path == '-' else os.path.splitext(os.path.basename(input_path))[0]
+
+
+# A distinct output name per input, in order, so that inputs such as
+# a/x.txt and b/x.txt don't write over each other's frames.
+def output_names(inputs):
+    names, used = [], set()
+    for path in inputs:
+        base = name = _input_name(path)
+        k = 1
+        while name in used:
+            k += 1
+            name = f'{base}-{k}'
+        used.add(name)
+        names.append(name)
+    return names
+
+
+# (path, frame number, packed cube) for every frame of one move log.
+def replay_frames(input_path, output, n, every=1, final=False, name=None):
+    name = name or _input_name(input_path)
+    if not final:
+        os.makedirs(os.path.join(output, name), exist_ok=True)
+    cube = Cube(n, lazy=n >= 128)
+    done = 0
+    with (nullcontext(sys.stdin.buffer) if input_path == '-' else open(input_path, 'rb')) as stream:
+        if not final:
+            yield os.path.join(output, name, f'{0:06d}.png'), 0, cube.to_bytes()
+        for moves, _ in read_batches(read_chunks(stream, 1 << 16)):
+            for move in moves:
+                cube.apply_move(move)
+                done += 1
+                if not final and done % every == 0:
+                    frame = done // every
+                    yield os.path.join(output, name, f'{frame:06d}.png'), frame, cube.to_bytes()
+    if final:
+        yield os.path.join(output, name + '.png'), 0, cube.to_bytes()
+    elif done % every:
+        frame = done // every + 1
+        yield os.path.join(output, name, f'{frame:06d}.png'), frame, cube.to_bytes()
+
+
+def _runs(frames, size):
+    run = []
+    for frame in frames:
+        run.append(frame)
+        if len(run) == size:
+            yield run
+            run = []
+    if run:
+        yield run
+
+
+# --- Driver ---
+# Render every frame of the given move logs; returns (frames, seconds).
+def render_replays(inputs, output, n=3, view='3d', size=(320, 240), camera=(25, -30, 4), spin=0.0,
+                   cell_size=20, every=1, final=False, processes=None, progress=None):
+    processes = processes or os.cpu_count()
+    os.makedirs(output, exist_ok=True)
+    start = last_report = time.perf_counter()
+    written = 0
+    with Pool(processes, initializer=_init_worker,
+              initargs=(view, size, camera, spin, cell_size)) as pool:
+        in_flight = deque()
+        for path, name in zip(inputs, output_names(inputs)):
+            for run in _runs(replay_frames(path, output, n, every, final, name), FRAMES_PER_TASK):
+                in_flight.append(pool.apply_async(_render, (run,)))
+                while len(in_flight) > 2 * processes:
+                    written += in_flight.popleft().get()
+                if progress and time.perf_counter() - last_report > 1:
+                    progress(written, time.perf_counter() - start)
+                    last_report = time.perf_counter()
+        while in_flight:
+            written += in_flight.popleft().get()
+    return written, time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render move logs to PNG frames without a window.")
+    parser.add_argument('inputs', nargs='+', help="move files (- for stdin)")
+    parser.add_argument('-o', '--output', required=True, help="output directory")
+    parser.add_argument('-n', '--size', type=int, default=3, help="cube size")
+    parser.add_argument('--view', choices=('3d', 'net'), default='3d', help="perspective view or flat net")
+    parser.add_argument('--image-size', default='320x240', help="3d frame size as WxH")
+    parser.add_argument('--camera', default='25,-30,4', help="3d camera as rot_x,rot_y,viewer_distance")
+    parser.add_argument('--spin', type=float, default=0.0, help="3d camera turn per frame in degrees")
+    parser.add_argument('--cell-size', type=int, default=20, help="net sticker size in pixels")
+    parser.add_argument('--every', type=int, default=1, help="moves per frame")
+    parser.add_argument('--final', action='store_true', help="only render the final state (thumbnails)")
+    parser.add_argument('--processes', type=int, default=None, help="worker processes (default: all cores)")
+    args = parser.parse_args(argv)
+    width, height = (int(v) for v in args.image_size.lower().split('x'))
+    rot_x, rot_y, viewer_distance = (float(v) for v in args.camera.split(','))
+    processes = args.processes or os.cpu_count()
+
+    def progress(frames, seconds):
+        print(f"\r{frames:,} frames ({frames / seconds:,.0f}/s)", end='', file=sys.stderr)
+
+    frames, seconds = render_replays(args.inputs, args.output, args.size, args.view, (width, height),
+                                     (rot_x, rot_y, viewer_distance), args.spin, args.cell_size,
+                                     max(1, args.every), args.final, processes, progress)
+    rate = frames / seconds if seconds else 0.0
+    print(f"\r{frames:,} frames in {seconds:.1f}s: {rate:,.1f} frames/s, "
+          f"{rate / processes:,.1f} frames/s per process ({processes} processes)", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,226 @@
+import os, sys, time, struct, argparse
+from rcube_core import Cube, parse_moves, simplify_moves
+
+# --- Headless replay of long move logs ---
+#     python rcube_replay.py moves.txt -n 64 --checkpoint-dir ckpt
+#     python rcube_replay.py moves.txt --checkpoint-dir ckpt --resume
+#     zcat moves.txt.gz | python rcube_replay.py - -n 64 --checkpoint-dir ckpt --seek 5000000
+# Moves are read in fixed-size chunks cut between moves, parsed chunk by
+# chunk and applied batch by batch, so memory stays flat however long the
+# input is.  After the batch that passes each multiple of --every moves the
+# cube is checkpointed together with the input byte offset reached; --resume
+# continues from the newest checkpoint and --seek K replays from the newest
+# one at or before move K up to K.
+# Nothing here imports pygame.
+
+CHECKPOINT_MAGIC = b'RCKP'
+CHECKPOINT_HEADER = struct.Struct('>4sQQ')   # magic, moves applied, input byte offset
+
+# Eager gathers beat the lazy strip updates up to about this size.
+LAZY_FROM = 128
+
+# Separators between tokens: the ASCII whitespace bytes.split() splits on.
+_WHITESPACE = (b' ', b'\t', b'\n', b'\r', b'\x0b', b'\x0c')
+# Bytes that start a move name, after any layer digits.
+_MOVE_LETTERS = frozenset(b'URFDLBurfdlbMESxyz')
+_DIGITS = frozenset(b'0123456789')
+# Carry allowed beyond a chunk before the input is rejected as unparseable.
+_MAX_CARRY = 1 << 10
+
+
+# Start of the last move in data, which may still be incomplete; every move
+# before it is whole.  Lets unspaced input ("RUR'U'...") be cut too.
+def _last_move_start(data):
+    i = len(data) - 1
+    while i >= 0 and data[i] not in _MOVE_LETTERS:
+        i -= 1
+    if i <= 0:
+        return 0
+    j = i
+    while j > 0 and data[j - 1] in _DIGITS:
+        j -= 1
+    # In "R23R" the 2 is the half-turn suffix of R, not part of 3R's prefix.
+    if j < i and j > 0 and data[j] == ord('2') and \
+            (data[j - 1] in _MOVE_LETTERS or data[j - 1] == ord('w')):
+        j += 1
+    return j
+
+
+# --- Input pipeline ---
+# (text, end offset) pieces holding only whole moves: each piece is cut at
+# its last whitespace or before its last move, whichever comes later, and
+# the rest is carried over into the next piece.
+def read_chunks(stream, chunk_size, offset=0):
+    carry = b''
+    while True:
+        data = stream.read(chunk_size)
+        if not data:
+            break
+        offset += len(data)
+        data = carry + data
+        cut = max(max(data.rfind(c) for c in _WHITESPACE) + 1, _last_move_start(data))
+        carry = data[cut:]
+        if len(carry) > max(chunk_size, _MAX_CARRY):
+            raise ValueError(f"no move boundary in {len(carry):,} bytes before offset {offset:,}")
+        if cut:
+            yield data[:cut].decode('ascii'), offset - len(carry)
+    if carry.strip():
+        yield carry.decode('ascii'), offset
+
+
+# Tokens repeat endlessly in a spaced move log, so single-move parses are
+# cached; longer tokens (unspaced runs) are parsed each time.
+_single_moves = {}
+_SINGLE_MOVES_MAX = 4096
+
+
+def _token_moves(token):
+    moves = _single_moves.get(token)
+    if moves is None:
+        moves = parse_moves(token)
+        if len(moves) == 1 and len(_single_moves) < _SINGLE_MOVES_MAX:
+            _single_moves[token] = moves
+    return moves
+
+
+# (moves, end offset) batches, one per chunk.
+def read_batches(chunks):
+    for text, end in chunks:
+        moves = []
+        for token in text.split():
+            moves.extend(_token_moves(token))
+        yield moves, end
+
+
+def _skip(stream, count):
+    if not count:
+        return
+    if stream.seekable():
+        stream.seek(count)
+        return
+    while count:
+        data = stream.read(min(count, 1 << 20))
+        if not data:
+            raise ValueError("the input is shorter than the checkpoint's offset")
+        count -= len(data)
+
+
+# --- Checkpoints ---
+def write_checkpoint(directory, cube, moves, offset):
+    path = os.path.join(directory, f'{moves:015d}.rckp')
+    with open(path + '.tmp', 'wb') as f:
+        f.write(CHECKPOINT_HEADER.pack(CHECKPOINT_MAGIC, moves, offset) + cube.to_bytes())
+    os.replace(path + '.tmp', path)
+
+
+def read_checkpoint(path):
+    with open(path, 'rb') as f:
+        data = f.read()
+    magic, moves, offset = CHECKPOINT_HEADER.unpack_from(data)
+    if magic != CHECKPOINT_MAGIC:
+        raise ValueError(f"{path} is not a replay checkpoint")
+    return Cube.from_bytes(data[CHECKPOINT_HEADER.size:]), moves, offset
+
+
+# Newest checkpoint in directory at or before move `limit` (None: newest).
+def find_checkpoint(directory, limit=None):
+    best = None
+    for name in os.listdir(directory):
+        if name.endswith('.rckp') and name[:-5].isdigit():
+            moves = int(name[:-5])
+            if (limit is None or moves <= limit) and (best is None or moves > best[0]):
+                best = moves, os.path.join(directory, name)
+    return best and best[1]
+
+
+# --- Replay ---
+# Apply the moves read from stream to cube, starting the move count at
+# `done`; stops after move `stop` if given.  Returns the moves applied.
+def replay(cube, stream, done=0, offset=0, stop=None, chunk_size=1 << 18, simplify=False,
+           checkpoint_dir=None, every=1_000_000, progress=None):
+    next_checkpoint = (done // every + 1) * every
+    last_report = time.perf_counter()
+    for moves, end in read_batches(read_chunks(stream, chunk_size, offset)):
+        if stop is not None and done + len(moves) >= stop:
+            moves = moves[:stop - done]
+        count = len(moves)
+        if simplify:
+            moves = simplify_moves(cube.n, moves)
+        try:
+            for move in moves:
+                cube.apply_move(move)
+        except ValueError as e:
+            raise ValueError(f"in moves {done + 1:,}-{done + count:,}: {e}") from None
+        done += count
+        if stop is not None and done >= stop:
+            break
+        if checkpoint_dir and done >= next_checkpoint:
+            write_checkpoint(checkpoint_dir, cube, done, end)
+            next_checkpoint = (done // every + 1) * every
+        if progress and time.perf_counter() - last_report > 1:
+            progress(done)
+            last_report = time.perf_counter()
+    return done
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a move log against a cube without a window.")
+    parser.add_argument('input', nargs='?', default='-', help="move file, or - for stdin")
+    parser.add_argument('-n', '--size', type=int, default=3, help="cube size (ignored when resuming)")
+    parser.add_argument('--storage', choices=('auto', 'eager', 'lazy'), default='auto',
+                        help=f"sticker updates; auto picks lazy from n={LAZY_FROM}")
+    parser.add_argument('--simplify', action='store_true',
+                        help="merge and cancel redundant turns within each batch")
+    parser.add_argument('--chunk-size', type=int, default=1 << 18, help="bytes read per batch")
+    parser.add_argument('--checkpoint-dir', help="directory for periodic state checkpoints")
+    parser.add_argument('--every', type=int, default=1_000_000, help="moves between checkpoints")
+    parser.add_argument('--resume', action='store_true', help="continue from the newest checkpoint")
+    parser.add_argument('--seek', type=int, metavar='K', help="stop after move K, starting from a checkpoint")
+    parser.add_argument('-o', '--output', help="write the final state (Cube.to_bytes) here")
+    args = parser.parse_args(argv)
+    if (args.resume or args.seek is not None) and not args.checkpoint_dir:
+        parser.error("--resume and --seek need --checkpoint-dir")
+    if args.checkpoint_dir:
+        os.makedirs(args.checkpoint_dir, exist_ok=True)
+
+    def lazy_for(n):
+        return args.storage == 'lazy' or (args.storage == 'auto' and n >= LAZY_FROM)
+
+    stream = sys.stdin.buffer if args.input == '-' else open(args.input, 'rb')
+    cube, done, offset = Cube(args.size, lazy_for(args.size)), 0, 0
+    path = None
+    if args.resume or args.seek is not None:
+        path = find_checkpoint(args.checkpoint_dir, args.seek)
+    if path:
+        cube, done, offset = read_checkpoint(path)
+        cube.lazy = lazy_for(cube.n)
+        print(f"starting from {path} (move {done:,})", file=sys.stderr)
+
+    start_moves, start = done, time.perf_counter()
+
+    def progress(count):
+        rate = (count - start_moves) / (time.perf_counter() - start)
+        print(f"{count:,} moves ({rate:,.0f}/s)", file=sys.stderr)
+
+    try:
+        _skip(stream, offset)
+        done = replay(cube, stream, done, offset, args.seek, args.chunk_size, args.simplify,
+                      args.checkpoint_dir, args.every, progress)
+    except ValueError as e:
+        sys.exit(f"error: {e}")
+    finally:
+        if stream is not sys.stdin.buffer:
+            stream.close()
+    elapsed = time.perf_counter() - start
+    if args.seek is not None and done < args.seek:
+        print(f"input ended at move {done:,}, before {args.seek:,}", file=sys.stderr)
+    if args.output:
+        with open(args.output, 'wb') as f:
+            f.write(cube.to_bytes())
+    rate = (done - start_moves) / elapsed if elapsed else 0
+    print(f"{done:,} moves, {done - start_moves:,} applied in {elapsed:.2f}s ({rate:,.0f}/s); "
+          f"solved: {cube.is_solved()}; hash {cube.zobrist:016x}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
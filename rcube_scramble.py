@@ -0,0 +1,183 @@
+import os, sys, time, argparse
+from collections import deque
+from multiprocessing import Pool
+import numpy as np
+from rcube_core import Cube, FACES, FACE_INDEX, invert_moves, layer_move_name
+from rcube_solver import CubieCube, Solver, DEFAULT_TABLE_DIR, build_tables, _parity
+
+# --- Scramble generator ---
+#     python rcube_scramble.py -n 3 --count 1000000 -o scrambles.txt
+#     python rcube_scramble.py -n 7 --length 100 --count 10000 -o 7x7.txt
+# 3×3 scrambles are random-state: a legal cube is drawn uniformly (random
+# corner and edge permutations with matching parity, random twists and
+# flips that sum to zero) and the scramble is the inverse of its two-phase
+# solution.  Other sizes get random-move scrambles.  Bulk runs spread the
+# work over a process pool, drop repeated states by Zobrist hash and write
+# one "<hash> <moves>" line per scramble as results arrive.
+
+RANDOM_STATE_SIZES = (3,)
+BATCH = 64                  # scrambles per pool task
+
+
+def default_length(n):
+    return {1: 0, 2: 11}.get(n, 20 * (n - 2))
+
+
+# --- Random states (3×3) ---
+# A uniformly random solvable cube, as cubies.
+def random_cubie(rng):
+    cp = rng.permutation(8).tolist()
+    ep = rng.permutation(12).tolist()
+    # Half of all edge permutations have the wrong parity for the corners;
+    # swapping two fixed edges fixes that without biasing the distribution.
+    if _parity(cp) != _parity(ep):
+        ep[0], ep[1] = ep[1], ep[0]
+    co = rng.integers(3, size=8)
+    co[7] = -co[:7].sum() % 3
+    eo = rng.integers(2, size=12)
+    eo[11] = eo[:11].sum() % 2
+    return CubieCube(cp, co.tolist(), ep, eo.tolist())
+
+
+# Random-state scramble: (moves, cube).  Applying the moves to a solved
+# cube gives the cube.
+def random_state_scramble(solver, rng, max_length=24):
+    cube = Cube(3)
+    cube.state = random_cubie(rng).to_state()
+    solution = solver.solve(cube, max_length)
+    return ' '.join(invert_moves(solution.split())), cube
+
+
+# --- Random moves (any n) ---
+# Outer and wide turns of up to n // 2 layers.  Turns of one axis commute,
+# so within a run of same-axis moves each (face, depth) is used once.
+def random_move_scramble(n, length, rng):
+    faces = list(FACES)
+    depths = max(1, n // 2)
+    moves, run, axis = [], set(), None
+    while len(moves) < length:
+        face = faces[rng.integers(6)]
+        depth = int(rng.integers(depths)) + 1
+        face_axis = FACE_INDEX[face] // 2
+        if face_axis != axis:
+            run, axis = set(), face_axis
+        elif (face, depth) in run:
+            continue
+        run.add((face, depth))
+        moves.append(layer_move_name(face, depth, int(rng.integers(3)) + 1, wide=depth > 1))
+    return ' '.join(moves)
+
+
+def scramble(n, rng=None, length=None, solver=None, max_length=24):
+    rng = rng or np.random.default_rng()
+    if n in RANDOM_STATE_SIZES:
+        return random_state_scramble(solver or Solver(), rng, max_length)[0]
+    return random_move_scramble(n, default_length(n) if length is None else length, rng)
+
+
+# --- Bulk generation ---
+def _init_worker(n, length, max_length, seed, table_dir):
+    global _n, _length, _max_length, _seed, _solver
+    _n, _length, _max_length, _seed = n, length, max_length, seed
+    _solver = Solver(table_dir) if n in RANDOM_STATE_SIZES else None
+
+
+# One batch of (zobrist hash, moves); task k always gets the same seed, so
+# a run is reproducible for a given --seed.
+def _batch(task):
+    rng = np.random.default_rng(np.random.SeedSequence(_seed, spawn_key=(task,)))
+    results = []
+    for _ in range(BATCH):
+        if _solver is not None:
+            moves, cube = random_state_scramble(_solver, rng, _max_length)
+        else:
+            moves = random_move_scramble(_n, _length, rng)
+            # Move by move: every scramble is new, so compiling it would
+            # only fill the sequence cache.
+            cube = Cube(_n, lazy=_n >= 128)
+            for move in moves.split():
+                cube.apply_move(move)
+        results.append((cube.zobrist, moves))
+    return results
+
+
+# Write `count` distinct scrambles to out; returns (written, duplicates).
+def generate(out, n, count, length=None, max_length=24, seed=None, processes=None,
+             table_dir=DEFAULT_TABLE_DIR, progress=None):
+    processes = processes or os.cpu_count()
+    length = default_length(n) if length is None else length
+    seed = np.random.SeedSequence().entropy if seed is None else seed
+    if n in RANDOM_STATE_SIZES:
+        build_tables(table_dir)
+    seen = set()
+    written = duplicates = task = stale = 0
+    last_report = time.perf_counter()
+    with Pool(processes, initializer=_init_worker,
+              initargs=(n, length, max_length, seed, table_dir)) as pool:
+        in_flight = deque()
+        while written < count:
+            # Keep a couple of batches per worker queued, never more than
+            # the scrambles still needed.
+            while len(in_flight) < 2 * processes and \
+                    (len(in_flight) * BATCH < count - written or not in_flight):
+                in_flight.append(pool.apply_async(_batch, (task,)))
+                task += 1
+            before = written
+            for key, moves in in_flight.popleft().get():
+                if key in seen:
+                    duplicates += 1
+                elif written < count:
+                    seen.add(key)
+                    out.write(f'{key:016x} {moves}\n')
+                    written += 1
+            # Short random-move scrambles reach few states; give up once
+            # batches stop turning up new ones.
+            stale = 0 if written > before else stale + 1
+            if stale > 4 * processes:
+                raise ValueError(f"only {written:,} distinct scrambles found; "
+                                 "use longer scrambles or a smaller --count")
+            if progress and time.perf_counter() - last_report > 1:
+                progress(written, duplicates)
+                last_report = time.perf_counter()
+    return written, duplicates
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate cube scrambles.")
+    parser.add_argument('-n', '--size', type=int, default=3, help="cube size")
+    parser.add_argument('--count', type=int, default=1, help="number of distinct scrambles")
+    parser.add_argument('--length', type=int, default=None,
+                        help="moves per random-move scramble (sizes other than 3)")
+    parser.add_argument('--max-length', type=int, default=24,
+                        help="longest 3x3 solution searched for (larger is faster)")
+    parser.add_argument('--seed', type=int, default=None, help="random seed")
+    parser.add_argument('--processes', type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument('--tables', default=DEFAULT_TABLE_DIR, help="solver table directory")
+    parser.add_argument('-o', '--output', default='-', help="output file, or - for stdout")
+    args = parser.parse_args(argv)
+    if args.count == 1 and args.output == '-':
+        rng = np.random.default_rng(args.seed)
+        solver = Solver(args.tables) if args.size in RANDOM_STATE_SIZES else None
+        print(scramble(args.size, rng, args.length, solver, args.max_length))
+        return
+
+    def progress(written, duplicates):
+        print(f"\r{written:,} scrambles ({duplicates:,} duplicates)", end='', file=sys.stderr)
+
+    start = time.perf_counter()
+    out = sys.stdout if args.output == '-' else open(args.output, 'w')
+    try:
+        written, duplicates = generate(out, args.size, args.count, args.length, args.max_length,
+                                       args.seed, args.processes, args.tables, progress)
+    except ValueError as e:
+        sys.exit(f"\nerror: {e}")
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    seconds = time.perf_counter() - start
+    print(f"\r{written:,} scrambles ({duplicates:,} duplicates dropped) in {seconds:.1f}s, "
+          f"{written / seconds:,.0f}/s", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
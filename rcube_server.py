@@ -0,0 +1,396 @@
+import os, sys, json, time, base64, random, asyncio, argparse, tempfile, itertools
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from rcube_core import Cube, parse_moves, simplify_moves
+
+# --- Cube-state service ---
+#     python rcube_server.py serve
+#     python rcube_server.py client --sessions 200 --batches 50
+# Many Cube sessions behind one asyncio server on a local socket (a Unix
+# socket by default, or 127.0.0.1:--port).  Both directions carry one JSON
+# object per line.  Requests have an "op" and an "id" that the reply echoes,
+# along with "ok" and either the results or an "error":
+#     new {n, lazy}                   -> {session, version, state}
+#     moves {session, moves, state}   -> {session, version, applied, state}
+#     get {session}                   -> {session, version, state}
+#     subscribe / unsubscribe {session}
+#     solve {session}                 -> {solution}   (3×3 only)
+#     stats {session?}                -> latency and throughput figures
+#     close {session}
+# States are Cube.to_bytes() in base64 ("state": false leaves them out of a
+# moves reply).  Subscribed connections get {event: "diff", session,
+# version, changed, colors} after every move batch: the sticker indices that
+# changed and their new colors as a string of digits (FACES order).
+# Every request runs as its own task and each session has a lock, so
+# sessions progress independently while each stays in order.  Move batches
+# above OFFLOAD_CELLS sticker updates (simplifying, diffing and encoding
+# included), and solves, run in a process pool so the event loop never
+# blocks on them.
+
+DEFAULT_SOCKET = os.path.join(tempfile.gettempdir(), 'rcube.sock')
+OFFLOAD_CELLS = 1 << 22
+LINE_LIMIT = 1 << 26
+MAX_N = 1024
+
+
+def _encode(cube):
+    return base64.b64encode(cube.to_bytes()).decode('ascii')
+
+
+def decode_state(text):
+    return Cube.from_bytes(base64.b64decode(text))
+
+
+# (changed sticker indices, their new colors as digits) between two states.
+def _diff(before, after):
+    changed = np.flatnonzero(before != after)
+    return changed.tolist(), (after[changed] + ord('0')).tobytes().decode()
+
+
+def _send(writer, message):
+    writer.write(json.dumps(message, separators=(',', ':')).encode() + b'\n')
+
+
+# Request latencies over a sliding window, plus running totals.
+class LatencyStats:
+    def __init__(self, window=1024):
+        self.latencies = deque(maxlen=window)
+        self.requests = 0
+        self.moves = 0
+        self.started = time.perf_counter()
+
+    def record(self, seconds, moves=0):
+        self.latencies.append(seconds)
+        self.requests += 1
+        self.moves += moves
+
+    def summary(self):
+        times = sorted(self.latencies)
+
+        def ms(p):
+            return round(1000 * times[min(len(times) - 1, int(len(times) * p / 100))], 3) if times else 0.0
+        elapsed = time.perf_counter() - self.started
+        return {'requests': self.requests, 'moves': self.moves, 'p50_ms': ms(50), 'p99_ms': ms(99),
+                'max_ms': ms(100), 'moves_per_sec': round(self.moves / elapsed, 1)}
+
+
+class Session:
+    def __init__(self, sid, n, lazy):
+        self.sid = sid
+        self.cube = Cube(n, lazy)
+        self.lock = asyncio.Lock()
+        self.subscribers = set()
+        self.stats = LatencyStats()
+
+
+# --- Process-pool work ---
+# A whole move batch off the event loop: returns the new state, the diff
+# for subscribers (if asked for) and the encoded state (if asked for).
+def _apply_in_worker(n, state, moves, diff, encode):
+    net = simplify_moves(n, moves)
+    cube = Cube(n, lazy=n >= 128)
+    cube.state = state
+    before = state.copy() if diff else None
+    for move in net:
+        cube.apply_move(move)
+    return cube.state, _diff(before, cube.state) if diff else None, _encode(cube) if encode else None
+
+
+def _solve_in_worker(state):
+    import rcube_solver
+    cube = Cube(3)
+    cube.state = state
+    return rcube_solver.solve(cube)
+
+
+class CubeService:
+    def __init__(self, processes=None):
+        self.sessions = {}
+        self.pool = ProcessPoolExecutor(processes)
+        self.stats = LatencyStats()
+        self._ids = itertools.count(1)
+
+    async def serve_connection(self, reader, writer):
+        tasks, subscribed = set(), set()
+        try:
+            while line := await reader.readline():
+                task = asyncio.create_task(self._respond(line, writer, subscribed))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+        except ConnectionError:
+            pass
+        finally:
+            for sid in subscribed:
+                if sid in self.sessions:
+                    self.sessions[sid].subscribers.discard(writer)
+            writer.close()
+
+    async def _respond(self, line, writer, subscribed):
+        start = time.perf_counter()
+        reply = {'id': None}
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("a request must be a JSON object")
+            reply['id'] = request.get('id')
+            handler = getattr(self, 'op_' + str(request.get('op')), None)
+            if handler is None:
+                raise ValueError(f"unknown op {request.get('op')!r}")
+            reply.update(await handler(request, writer, subscribed))
+            reply['ok'] = True
+        except Exception as e:
+            # Every request gets a reply, or its client would wait forever.
+            reply.update(ok=False, error=str(e) or type(e).__name__)
+        _send(writer, reply)
+        elapsed = time.perf_counter() - start
+        self.stats.record(elapsed, reply.get('applied', 0))
+        session = self.sessions.get(reply.get('session'))
+        if session:
+            session.stats.record(elapsed, reply.get('applied', 0))
+        await writer.drain()
+
+    def _session(self, request):
+        sid = request.get('session')
+        if sid not in self.sessions:
+            raise ValueError(f"unknown session {sid!r}")
+        return self.sessions[sid]
+
+    # --- Operations ---
+    async def op_new(self, request, writer, subscribed):
+        n = int(request.get('n', 3))
+        if not 1 <= n <= MAX_N:
+            raise ValueError(f"n must be between 1 and {MAX_N}")
+        session = Session(next(self._ids), n, bool(request.get('lazy', False)))
+        self.sessions[session.sid] = session
+        return {'session': session.sid, 'version': 0, 'state': _encode(session.cube)}
+
+    async def op_moves(self, request, writer, subscribed):
+        session = self._session(request)
+        moves = request['moves']
+        moves = parse_moves(moves) if isinstance(moves, str) else list(moves)
+        send_state = request.get('state', True)
+        async with session.lock:
+            cube = session.cube
+            diff = encoded = None
+            if len(moves) * 6 * cube.n * cube.n >= OFFLOAD_CELLS:
+                loop = asyncio.get_running_loop()
+                cube.state, diff, encoded = await loop.run_in_executor(
+                    self.pool, _apply_in_worker, cube.n, cube.state, moves,
+                    bool(session.subscribers), send_state)
+            else:
+                # Resolves (and so validates) every move before any is applied.
+                net = simplify_moves(cube.n, moves)
+                before = cube.state.copy() if session.subscribers else None
+                for move in net:
+                    cube.apply_move(move)
+                if before is not None:
+                    diff = _diff(before, cube.state)
+                if send_state:
+                    encoded = _encode(cube)
+            if diff is not None:
+                self._push_diff(session, *diff)
+            reply = {'session': session.sid, 'version': cube.version, 'applied': len(moves)}
+            if send_state:
+                reply['state'] = encoded
+        return reply
+
+    def _push_diff(self, session, changed, colors):
+        event = {'event': 'diff', 'session': session.sid, 'version': session.cube.version,
+                 'changed': changed, 'colors': colors}
+        for writer in session.subscribers:
+            _send(writer, event)
+
+    async def op_get(self, request, writer, subscribed):
+        session = self._session(request)
+        async with session.lock:
+            return {'session': session.sid, 'version': session.cube.version, 'state': _encode(session.cube)}
+
+    async def op_subscribe(self, request, writer, subscribed):
+        session = self._session(request)
+        session.subscribers.add(writer)
+        subscribed.add(session.sid)
+        return {'session': session.sid}
+
+    async def op_unsubscribe(self, request, writer, subscribed):
+        session = self._session(request)
+        session.subscribers.discard(writer)
+        subscribed.discard(session.sid)
+        return {'session': session.sid}
+
+    async def op_solve(self, request, writer, subscribed):
+        session = self._session(request)
+        if session.cube.n != 3:
+            raise ValueError("only 3×3 sessions can be solved")
+        async with session.lock:
+            state = session.cube.state.copy()
+        loop = asyncio.get_running_loop()
+        solution = await loop.run_in_executor(self.pool, _solve_in_worker, state)
+        return {'session': session.sid, 'solution': solution}
+
+    async def op_stats(self, request, writer, subscribed):
+        if 'session' in request:
+            session = self._session(request)
+            return {'session': session.sid, 'stats': session.stats.summary()}
+        return {'stats': self.stats.summary(), 'sessions': len(self.sessions)}
+
+    async def op_close(self, request, writer, subscribed):
+        session = self._session(request)
+        del self.sessions[session.sid]
+        return {'closed': session.sid, 'stats': session.stats.summary()}
+
+
+async def serve(socket_path=DEFAULT_SOCKET, port=None, processes=None):
+    service = CubeService(processes)
+    if port:
+        server = await asyncio.start_server(service.serve_connection, '127.0.0.1', port, limit=LINE_LIMIT)
+        where = f"127.0.0.1:{port}"
+    else:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        server = await asyncio.start_unix_server(service.serve_connection, socket_path, limit=LINE_LIMIT)
+        where = socket_path
+    print(f"serving cubes on {where}", file=sys.stderr)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.pool.shutdown(cancel_futures=True)
+
+
+# --- Client ---
+class Client:
+    def __init__(self, reader, writer):
+        self._reader, self._writer = reader, writer
+        self._pending = {}
+        self._ids = itertools.count(1)
+        # Pushed diff events, in arrival order.
+        self.events = asyncio.Queue()
+        self._task = asyncio.create_task(self._read())
+
+    @classmethod
+    async def connect(cls, socket_path=DEFAULT_SOCKET, port=None):
+        if port:
+            reader, writer = await asyncio.open_connection('127.0.0.1', port, limit=LINE_LIMIT)
+        else:
+            reader, writer = await asyncio.open_unix_connection(socket_path, limit=LINE_LIMIT)
+        return cls(reader, writer)
+
+    async def _read(self):
+        while line := await self._reader.readline():
+            message = json.loads(line)
+            if 'event' in message:
+                self.events.put_nowait(message)
+            else:
+                # Replies to requests this client never sent are dropped.
+                future = self._pending.pop(message.get('id'), None)
+                if future is not None:
+                    future.set_result(message)
+        for future in self._pending.values():
+            future.set_exception(ConnectionError("server closed the connection"))
+
+    async def request(self, op, **fields):
+        rid = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[rid] = future
+        _send(self._writer, dict(fields, op=op, id=rid))
+        await self._writer.drain()
+        reply = await future
+        if not reply['ok']:
+            raise ValueError(reply['error'])
+        return reply
+
+    async def close(self):
+        self._writer.close()
+        await self._writer.wait_closed()
+        self._task.cancel()
+
+
+# Load test: many sessions over a few connections send random move batches
+# and check the returned states against local cubes; subscribed sessions
+# also rebuild their state from the pushed diffs.
+async def run_client(args):
+    clients = [await Client.connect(args.socket, args.port) for _ in range(args.connections)]
+    names = [f + s for f in 'URFDLB' for s in ('', "'", '2')]
+    mirrors = {}
+
+    async def follow(client):
+        while True:
+            event = await client.events.get()
+            state = mirrors[event['session']]
+            state[event['changed']] = np.frombuffer(event['colors'].encode(), dtype=np.uint8) - ord('0')
+            client.events.task_done()
+
+    followers = [asyncio.create_task(follow(c)) for c in clients]
+    mismatches = 0
+
+    async def session(k):
+        nonlocal mismatches
+        client = clients[k % len(clients)]
+        sid = (await client.request('new', n=args.n))['session']
+        local = Cube(args.n)
+        subscribe = k % 2 == 0
+        if subscribe:
+            mirrors[sid] = local.state.copy()
+            await client.request('subscribe', session=sid)
+        for _ in range(args.batches):
+            moves = ' '.join(random.choice(names) for _ in range(args.batch_size))
+            reply = await client.request('moves', session=sid, moves=moves)
+            local.apply(moves)
+        mismatches += decode_state(reply['state']) != local
+        await client.events.join()
+        if subscribe:
+            mismatches += not np.array_equal(mirrors[sid], local.state)
+        return sid
+
+    start = time.perf_counter()
+    sids = await asyncio.gather(*(session(k) for k in range(args.sessions)))
+    elapsed = time.perf_counter() - start
+    total = args.sessions * args.batches * args.batch_size
+    per_session = [(await clients[0].request('stats', session=sid))['stats'] for sid in sids]
+    service = (await clients[0].request('stats'))['stats']
+    if args.solve and args.n == 3:
+        solved = await clients[0].request('solve', session=sids[0])
+        print(f"solve: {solved['solution']}")
+    for sid in sids:
+        await clients[0].request('close', session=sid)
+    for task in followers:
+        task.cancel()
+    for client in clients:
+        await client.close()
+    p50 = sorted(s['p50_ms'] for s in per_session)[len(per_session) // 2]
+    p99 = max(s['p99_ms'] for s in per_session)
+    print(f"{args.sessions} sessions, {total:,} moves in {elapsed:.2f}s: {total / elapsed:,.0f} moves/s, "
+          f"{args.sessions * args.batches / elapsed:,.0f} batches/s")
+    print(f"per-session latency: median p50 {p50:.2f}ms, worst p99 {p99:.2f}ms; "
+          f"server p50 {service['p50_ms']:.2f}ms p99 {service['p99_ms']:.2f}ms")
+    print(f"state mismatches: {mismatches}")
+    return mismatches
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve cube sessions over a local socket, or load-test a server.")
+    parser.add_argument('command', choices=('serve', 'client'))
+    parser.add_argument('--socket', default=DEFAULT_SOCKET, help="Unix socket path")
+    parser.add_argument('--port', type=int, help="use 127.0.0.1:PORT instead of a Unix socket")
+    parser.add_argument('--processes', type=int, help="worker processes for heavy batches and solves")
+    parser.add_argument('--sessions', type=int, default=100, help="client: concurrent sessions")
+    parser.add_argument('--connections', type=int, default=4, help="client: connections shared by the sessions")
+    parser.add_argument('--batches', type=int, default=50, help="client: move batches per session")
+    parser.add_argument('--batch-size', type=int, default=20, help="client: moves per batch")
+    parser.add_argument('-n', type=int, default=3, help="client: cube size")
+    parser.add_argument('--solve', action='store_true', help="client: also solve one 3×3 session")
+    args = parser.parse_args(argv)
+    try:
+        if args.command == 'serve':
+            asyncio.run(serve(args.socket, args.port, args.processes))
+        else:
+            sys.exit(1 if asyncio.run(run_client(args)) else 0)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,499 @@
+import os, itertools
+from multiprocessing import Pool
+from math import comb, factorial
+import numpy as np
+from rcube_core import Cube, FACES, FACE_FRAMES, sticker_positions
+
+# --- Two-phase (Kociemba-style) solver for 3×3 rcube_core cubes ---
+# Phase 1 brings the cube into the subgroup <U, D, R2, L2, F2, B2> (no twisted
+# corners, no flipped edges, E-slice edges in the E slice); phase 2 solves it
+# using only those moves.  Both phases are IDA* searches over small integer
+# coordinates, with move tables and pruning tables generated once, saved as
+# .npy files and loaded memory-mapped so a fresh process starts instantly.
+
+# Cubie slots, each listing its faces clockwise seen from outside with the
+# U/D face first (Kociemba's order).
+CORNERS = ('URF', 'UFL', 'ULB', 'UBR', 'DFR', 'DLF', 'DBL', 'DRB')
+EDGES = ('UR', 'UF', 'UL', 'UB', 'DR', 'DF', 'DL', 'DB', 'FR', 'FL', 'BL', 'BR')
+
+# The 18 face moves, indexed 3 * face + (quarter turns - 1).
+MOVE_FACES = 'URFDLB'
+MOVE_NAMES = [f + s for f in MOVE_FACES for s in ('', '2', "'")]
+# Moves that keep a cube inside the phase-2 subgroup.
+PHASE2_MOVES = [MOVE_NAMES.index(m) for m in
+                ('U', 'U2', "U'", 'D', 'D2', "D'", 'R2', 'L2', 'F2', 'B2')]
+
+N_TWIST = 3 ** 7          # corner orientations
+N_FLIP = 2 ** 11          # edge orientations
+N_SLICE = comb(12, 4)     # positions of the four E-slice edges
+N_PERM8 = factorial(8)    # corner / U-D edge permutations
+N_PERM4 = factorial(4)    # E-slice edge permutation
+
+# Bump when a coordinate definition changes, so stale tables are rebuilt.
+TABLE_VERSION = 1
+DEFAULT_TABLE_DIR = os.environ.get(
+    'RCUBE_TABLES', os.path.join(os.path.expanduser('~'), '.cache', 'rcube3d', 'solver'))
+
+
+# --- Facelets ---
+# Sticker index (into a 3×3 Cube.state) of each face of a cubie slot.
+def _slot_stickers(slot):
+    pos = sticker_positions(3)
+    normals = {f: np.array(c) for f, (c, _, _) in FACE_FRAMES.items()}
+    corner = sum(normals[f] for f in slot) * 2
+    stickers = []
+    for f in slot:
+        target = corner + normals[f]
+        stickers.append(int(np.flatnonzero((pos == target).all(axis=1))[0]))
+    return stickers
+
+CORNER_STICKERS = [_slot_stickers(s) for s in CORNERS]
+EDGE_STICKERS = [_slot_stickers(s) for s in EDGES]
+CORNER_COLORS = [[FACES.index(f) for f in s] for s in CORNERS]
+EDGE_COLORS = [[FACES.index(f) for f in s] for s in EDGES]
+
+
+# --- Cubie level ---
+# A cube as corner/edge permutation and orientation in "replaced by" form:
+# cp[i] is the corner sitting in slot i.  a * b means a followed by b, the
+# same convention as the sticker gathers in rcube_core.
+class CubieCube:
+    def __init__(self, cp=None, co=None, ep=None, eo=None):
+        self.cp = list(range(8)) if cp is None else list(cp)
+        self.co = [0] * 8 if co is None else list(co)
+        self.ep = list(range(12)) if ep is None else list(ep)
+        self.eo = [0] * 12 if eo is None else list(eo)
+
+    def __mul__(self, other):
+        return CubieCube(
+            [self.cp[p] for p in other.cp],
+            [(self.co[p] + o) % 3 for p, o in zip(other.cp, other.co)],
+            [self.ep[p] for p in other.ep],
+            [(self.eo[p] + o) % 2 for p, o in zip(other.ep, other.eo)])
+
+    @classmethod
+    def from_cube(cls, cube):
+        if cube.n != 3:
+            raise ValueError(f"the two-phase solver needs a 3x3 cube, got n={cube.n}")
+        state = cube.state
+        # Recolor by centers so cubes turned with slices or rotations work.
+        recolor = np.empty(6, dtype=np.intp)
+        recolor[state[4::9]] = np.arange(6)
+        colors = recolor[state].tolist()
+        cc = cls()
+        for i, stickers in enumerate(CORNER_STICKERS):
+            faces = [colors[k] for k in stickers]
+            ori = next((k for k, c in enumerate(faces) if FACES[c] in 'UD'), None)
+            turned = faces[ori:] + faces[:ori] if ori is not None else None
+            match = [j for j, c in enumerate(CORNER_COLORS) if c == turned]
+            if not match:
+                raise ValueError(f"invalid corner in slot {CORNERS[i]}")
+            cc.cp[i], cc.co[i] = match[0], ori
+        for i, stickers in enumerate(EDGE_STICKERS):
+            faces = [colors[k] for k in stickers]
+            if faces in EDGE_COLORS:
+                cc.ep[i], cc.eo[i] = EDGE_COLORS.index(faces), 0
+            elif faces[::-1] in EDGE_COLORS:
+                cc.ep[i], cc.eo[i] = EDGE_COLORS.index(faces[::-1]), 1
+            else:
+                raise ValueError(f"invalid edge in slot {EDGES[i]}")
+        cc.verify()
+        return cc
+
+    # Home-colored 3×3 sticker state with solved centers (from_cube inverse).
+    def to_state(self):
+        state = np.repeat(np.arange(6, dtype=np.uint8), 9)
+        for stickers, c, o in zip(CORNER_STICKERS, self.cp, self.co):
+            for k, color in enumerate(CORNER_COLORS[c]):
+                state[stickers[(o + k) % 3]] = color
+        for stickers, e, o in zip(EDGE_STICKERS, self.ep, self.eo):
+            colors = EDGE_COLORS[e]
+            state[stickers] = colors[::-1] if o else colors
+        return state
+
+    def verify(self):
+        if sorted(self.cp) != list(range(8)) or sorted(self.ep) != list(range(12)):
+            raise ValueError("some cubie appears twice")
+        if sum(self.co) % 3:
+            raise ValueError("twisted corner")
+        if sum(self.eo) % 2:
+            raise ValueError("flipped edge")
+        if _parity(self.cp) != _parity(self.ep):
+            raise ValueError("corner and edge permutation parities differ")
+
+
+def _parity(perm):
+    return sum(perm[i] > perm[j] for i in range(len(perm)) for j in range(i)) % 2
+
+
+# Cubie form of the 18 moves, read off rcube_core's own move permutations.
+def _move_cubies():
+    cubies = []
+    for name in MOVE_NAMES:
+        cube = Cube(3)
+        cube.apply_move(name)
+        cubies.append(CubieCube.from_cube(cube))
+    return cubies
+
+MOVE_CUBIES = _move_cubies()
+
+
+# --- Coordinates ---
+# Encoders work on (N, k) arrays of cubie rows so move tables can be built
+# for every coordinate value at once.
+def _perm_rank(perms):
+    perms = np.asarray(perms)
+    k = perms.shape[1]
+    rank = np.zeros(len(perms), dtype=np.int64)
+    for i in range(k):
+        smaller = (perms[:, i + 1:] < perms[:, i:i + 1]).sum(axis=1)
+        rank = rank * (k - i) + smaller
+    return rank
+
+
+def _perm_unrank(ranks, k):
+    ranks = np.asarray(ranks, dtype=np.int64)
+    digits = np.empty((len(ranks), k), dtype=np.int64)
+    for i in range(k - 1, -1, -1):
+        ranks, digits[:, i] = np.divmod(ranks, k - i)
+    perms = np.empty_like(digits)
+    free = np.ones((len(ranks), k), dtype=bool)
+    for i in range(k):
+        # Pick the digits[i]-th smallest value not used yet.
+        chosen = np.argmax(np.cumsum(free, axis=1) == digits[:, i:i + 1] + 1, axis=1)
+        perms[:, i] = chosen
+        free[np.arange(len(ranks)), chosen] = False
+    return perms
+
+
+def _ori_rank(oris, base):
+    # Orientation of all but the last cubie (the last is implied by the sum).
+    oris = np.asarray(oris)[:, :-1]
+    weights = base ** np.arange(oris.shape[1] - 1, -1, -1)
+    return oris @ weights
+
+
+def _ori_unrank(ranks, base, count):
+    ranks = np.asarray(ranks, dtype=np.int64)
+    oris = np.empty((len(ranks), count), dtype=np.int64)
+    for i in range(count - 2, -1, -1):
+        ranks, oris[:, i] = np.divmod(ranks, base)
+    oris[:, -1] = (-oris[:, :-1].sum(axis=1)) % base
+    return oris
+
+
+# Slice coordinate: the set of slots holding E-slice edges (FR, FL, BL, BR),
+# ranked among the 495 4-subsets of the 12 edge slots in lexicographic order.
+_SLICE_SETS = np.array(list(itertools.combinations(range(12), 4)))
+_SLICE_BY_MASK = np.full(1 << 12, -1, dtype=np.int64)
+_SLICE_BY_MASK[(1 << _SLICE_SETS).sum(axis=1)] = np.arange(N_SLICE)
+SLICE_SOLVED = int(_SLICE_BY_MASK[0b111100000000])
+
+
+def _slice_rank(ep):
+    in_slice = np.asarray(ep) >= 8
+    return _SLICE_BY_MASK[(in_slice << np.arange(12)).sum(axis=1)]
+
+
+def _coords_phase1(cc):
+    return (int(_ori_rank([cc.co], 3)[0]), int(_ori_rank([cc.eo], 2)[0]),
+            int(_slice_rank([cc.ep])[0]))
+
+
+def _coords_phase2(cc):
+    return (int(_perm_rank([cc.cp])[0]), int(_perm_rank([cc.ep[:8]])[0]),
+            int(_perm_rank([[e - 8 for e in cc.ep[8:]]])[0]))
+
+
+# --- Piece-level encoding ---
+# A legal 3×3 cube as one integer, in mixed radix: center layout (one of the
+# 24 whole-cube orientations), corner permutation, twist, edge permutation
+# and flip.  It fits in 9 bytes against 21 for Cube.to_bytes.
+def _center_layouts():
+    seen, todo = set(), [Cube(3)]
+    while todo:
+        cube = todo.pop()
+        layout = tuple(cube.state[4::9].tolist())
+        if layout not in seen:
+            seen.add(layout)
+            for axis in 'xyz':
+                turned = Cube(3)
+                turned.state = cube.state.copy()
+                turned.apply_move(axis)
+                todo.append(turned)
+    return sorted(seen)
+
+CENTER_LAYOUTS = _center_layouts()
+_LAYOUT_INDEX = {layout: k for k, layout in enumerate(CENTER_LAYOUTS)}
+N_PERM12 = factorial(12)
+N_PIECES = len(CENTER_LAYOUTS) * N_PERM8 * N_TWIST * N_PERM12 * N_FLIP
+
+
+def piece_coordinate(cube):
+    cc = CubieCube.from_cube(cube)
+    code = _LAYOUT_INDEX[tuple(cube.state[4::9].tolist())]
+    twist, flip, _ = _coords_phase1(cc)
+    for value, size in ((_perm_rank([cc.cp])[0], N_PERM8), (twist, N_TWIST),
+                        (_perm_rank([cc.ep])[0], N_PERM12), (flip, N_FLIP)):
+        code = code * size + int(value)
+    return code
+
+
+def cube_from_piece_coordinate(code, lazy=False):
+    if not 0 <= code < N_PIECES:
+        raise ValueError(f"piece coordinate out of range: {code}")
+    code, flip = divmod(code, N_FLIP)
+    code, ep = divmod(code, N_PERM12)
+    code, twist = divmod(code, N_TWIST)
+    layout, cp = divmod(code, N_PERM8)
+    cc = CubieCube(_perm_unrank([cp], 8)[0].tolist(), _ori_unrank([twist], 3, 8)[0].tolist(),
+                   _perm_unrank([ep], 12)[0].tolist(), _ori_unrank([flip], 2, 12)[0].tolist())
+    cc.verify()
+    cube = Cube(3, lazy)
+    cube.state = np.array(CENTER_LAYOUTS[layout], dtype=np.uint8)[cc.to_state()]
+    return cube
+
+
+# --- Move tables ---
+# table[coord, m] is the coordinate after move m.
+def _twist_moves():
+    co = _ori_unrank(np.arange(N_TWIST), 3, 8)
+    return np.stack([_ori_rank((co[:, m.cp] + m.co) % 3, 3) for m in MOVE_CUBIES], axis=1)
+
+
+def _flip_moves():
+    eo = _ori_unrank(np.arange(N_FLIP), 2, 12)
+    return np.stack([_ori_rank((eo[:, m.ep] + m.eo) % 2, 2) for m in MOVE_CUBIES], axis=1)
+
+
+def _slice_moves():
+    ep = np.zeros((N_SLICE, 12), dtype=np.int64)
+    ep[np.arange(N_SLICE)[:, None], _SLICE_SETS] = 8
+    return np.stack([_slice_rank(ep[:, m.ep]) for m in MOVE_CUBIES], axis=1)
+
+
+# Phase-2 tables only need the phase-2 moves (columns follow PHASE2_MOVES).
+def _corner_moves():
+    cp = _perm_unrank(np.arange(N_PERM8), 8)
+    return np.stack([_perm_rank(cp[:, MOVE_CUBIES[m].cp]) for m in PHASE2_MOVES], axis=1)
+
+
+def _ud_edge_moves():
+    ep = _perm_unrank(np.arange(N_PERM8), 8)
+    return np.stack([_perm_rank(ep[:, MOVE_CUBIES[m].ep[:8]]) for m in PHASE2_MOVES], axis=1)
+
+
+def _slice_perm_moves():
+    sp = _perm_unrank(np.arange(N_PERM4), 4)
+    return np.stack([_perm_rank(sp[:, [e - 8 for e in MOVE_CUBIES[m].ep[8:]]])
+                     for m in PHASE2_MOVES], axis=1)
+
+
+# --- Pruning tables ---
+# Breadth-first distances over the product of two coordinates, indexed
+# a * size_b + b; 255 marks unreached entries while building.
+def _prune_table(moves_a, moves_b, goal):
+    size_b = len(moves_b)
+    table = np.full(len(moves_a) * size_b, 255, dtype=np.uint8)
+    table[goal] = 0
+    depth = 0
+    frontier = np.array([goal])
+    while len(frontier):
+        a, b = np.divmod(frontier, size_b)
+        nxt = (moves_a[a] * size_b + moves_b[b]).ravel()
+        nxt = np.unique(nxt[table[nxt] == 255])
+        depth += 1
+        table[nxt] = depth
+        frontier = nxt
+    return table
+
+
+TABLES = {
+    'twist_move': _twist_moves,
+    'flip_move': _flip_moves,
+    'slice_move': _slice_moves,
+    'corner_move': _corner_moves,
+    'ud_edge_move': _ud_edge_moves,
+    'slice_perm_move': _slice_perm_moves,
+}
+PRUNING = {
+    # name: (move table a, move table b, goal index)
+    'twist_slice_prune': ('twist_move', 'slice_move', SLICE_SOLVED),
+    'flip_slice_prune': ('flip_move', 'slice_move', SLICE_SOLVED),
+    'corner_slice_prune': ('corner_move', 'slice_perm_move', 0),
+    'edge_slice_prune': ('ud_edge_move', 'slice_perm_move', 0),
+}
+# SHA-256 of every saved table for this TABLE_VERSION; rcube_tables checks
+# its builds against these and prints fresh ones after a coordinate change.
+TABLE_SHA256 = {
+    'twist_move': '939129a843f648c462822075a0c27a7144ef566c8e7d1472c64d14e467a735a3',
+    'flip_move': '9039eab0160efe072d62be9e01ad28267d629321c780c0750d84cd34c382050c',
+    'slice_move': '5a6ca547699b6a67864dabe5c1c2bd5303ad84da3809d50bc3ca971bb55baae2',
+    'corner_move': '72f06149e6406f61d23b4043f700a77f320f970db611bd93a15c2178876f8309',
+    'ud_edge_move': '10d0ba7d3e4ed66bcfaf78985e57feb7bd493e7a751b6c57c370a34d28a8d0fa',
+    'slice_perm_move': 'f65cc01382c8ccab7c560cdf6095f75ecf12ca7e4a6ed86bd92c53b3ba29777b',
+    'twist_slice_prune': '30aa2f54c9edd5d47de7fa6c90addc28a55d9648498e5e4568e6382a885c9d22',
+    'flip_slice_prune': '66906204d3d67a8c5ae06ebf5958abaa837093e31941af4addd4603cb208d3fd',
+    'corner_slice_prune': 'c499279249a84b7f0e5966ca3d1e32e0e3ea290798944d352d888131f4a1e614',
+    'edge_slice_prune': '055e8eb964beed54719f29466bd91126ed89a94f57ea02e16b2f536044e3bd53',
+}
+
+
+def _save(path, array):
+    tmp = path + '.tmp.npy'
+    np.save(tmp, array)
+    os.replace(tmp, path)
+
+
+# Make sure every table exists under table_dir, generating the missing ones.
+def build_tables(table_dir=DEFAULT_TABLE_DIR):
+    path = os.path.join(table_dir, f'v{TABLE_VERSION}')
+    os.makedirs(path, exist_ok=True)
+    for name, make in TABLES.items():
+        file = os.path.join(path, name + '.npy')
+        if not os.path.exists(file):
+            _save(file, make().astype(np.uint16))
+    for name, (a, b, goal) in PRUNING.items():
+        file = os.path.join(path, name + '.npy')
+        if not os.path.exists(file):
+            moves_a = np.load(os.path.join(path, a + '.npy')).astype(np.int64)
+            moves_b = np.load(os.path.join(path, b + '.npy')).astype(np.int64)
+            _save(file, _prune_table(moves_a, moves_b, goal))
+    return path
+
+
+# Memory-mapped view of a saved table as a flat memoryview, which the search
+# can index with plain Python ints.
+def _load(path, name):
+    table = np.load(os.path.join(path, name + '.npy'), mmap_mode='r')
+    return memoryview(table.reshape(-1)).cast('B').cast(table.dtype.char), table.shape
+
+
+class Solver:
+    def __init__(self, table_dir=DEFAULT_TABLE_DIR):
+        path = build_tables(table_dir)
+        self._tables = {}
+        for name in list(TABLES) + list(PRUNING):
+            self._tables[name], _ = _load(path, name)
+
+    # Return a move string that solves a 3×3 Cube (relative to its current
+    # centers), at most max_length moves long.  The first solution found is
+    # returned, so a larger max_length is faster but gives longer solutions.
+    def solve(self, cube, max_length=24):
+        cc = CubieCube.from_cube(cube)
+        twist, flip, slc = _coords_phase1(cc)
+        t = self._tables
+        h = max(t['twist_slice_prune'][twist * N_SLICE + slc],
+                t['flip_slice_prune'][flip * N_SLICE + slc])
+        for depth in range(h, max_length + 1):
+            path = []
+            solution = self._phase1(cc, twist, flip, slc, depth, path,
+                                    lambda p1: min(18, max_length - p1))
+            if solution is not None:
+                return ' '.join(MOVE_NAMES[m] for m in solution)
+        raise ValueError(f"no solution within {max_length} moves")
+
+    # phase2_budget(len(path)) gives the phase-2 moves allowed after path.
+    def _phase1(self, cc, twist, flip, slc, togo, path, phase2_budget):
+        t = self._tables
+        if togo == 0:
+            if twist or flip or slc != SLICE_SOLVED:
+                return None
+            # A phase-1 path ending in a phase-2 move was already tried shorter.
+            if path and path[-1] in PHASE2_MOVES and len(path) > 1:
+                return None
+            return self._start_phase2(cc, path, phase2_budget(len(path)))
+        twist_move, flip_move, slice_move = t['twist_move'], t['flip_move'], t['slice_move']
+        twist_prune, flip_prune = t['twist_slice_prune'], t['flip_slice_prune']
+        last = path[-1] // 3 if path else -1
+        for m in range(18):
+            face = m // 3
+            # Skip turning the same face twice, and fix the order of
+            # commuting opposite faces (U before D, R before L, F before B).
+            if face == last or face == last - 3:
+                continue
+            sl = slice_move[slc * 18 + m]
+            tw = twist_move[twist * 18 + m]
+            if twist_prune[tw * N_SLICE + sl] >= togo:
+                continue
+            fl = flip_move[flip * 18 + m]
+            if flip_prune[fl * N_SLICE + sl] >= togo:
+                continue
+            path.append(m)
+            found = self._phase1(cc, tw, fl, sl, togo - 1, path, phase2_budget)
+            if found is not None:
+                return found
+            path.pop()
+        return None
+
+    def _start_phase2(self, cc, path, budget):
+        for m in path:
+            cc = cc * MOVE_CUBIES[m]
+        corners, edges, sp = _coords_phase2(cc)
+        t = self._tables
+        h = max(t['corner_slice_prune'][corners * N_PERM4 + sp],
+                t['edge_slice_prune'][edges * N_PERM4 + sp])
+        last = path[-1] // 3 if path else -1
+        for depth in range(h, budget + 1):
+            tail = []
+            if self._phase2(corners, edges, sp, depth, last, tail):
+                return path + tail
+        return None
+
+    def _phase2(self, corners, edges, sp, togo, last, tail):
+        if togo == 0:
+            return corners == 0 and edges == 0 and sp == 0
+        t = self._tables
+        corner_move, edge_move, sp_move = t['corner_move'], t['ud_edge_move'], t['slice_perm_move']
+        corner_prune, edge_prune = t['corner_slice_prune'], t['edge_slice_prune']
+        for k, m in enumerate(PHASE2_MOVES):
+            face = m // 3
+            if face == last or face == last - 3:
+                continue
+            s = sp_move[sp * 10 + k]
+            c = corner_move[corners * 10 + k]
+            if corner_prune[c * N_PERM4 + s] >= togo:
+                continue
+            e = edge_move[edges * 10 + k]
+            if edge_prune[e * N_PERM4 + s] >= togo:
+                continue
+            tail.append(m)
+            if self._phase2(c, e, s, togo - 1, face, tail):
+                return True
+            tail.pop()
+        return False
+
+
+_default_solver = None
+
+
+# Solve with a shared Solver using the default table directory.
+def solve(cube, max_length=24):
+    global _default_solver
+    if _default_solver is None:
+        _default_solver = Solver()
+    return _default_solver.solve(cube, max_length)
+
+
+# Worker side of solve_many: each process maps the same table files, so the
+# tables are shared through the page cache rather than copied.
+_worker_solver = None
+
+def _init_worker(table_dir):
+    global _worker_solver
+    _worker_solver = Solver(table_dir)
+
+
+def _solve_state(args):
+    state, max_length = args
+    cube = Cube(3)
+    cube.state = state
+    return _worker_solver.solve(cube, max_length)
+
+
+# Solve many 3×3 cubes across a process pool; returns solutions in order.
+def solve_many(cubes, max_length=24, processes=None, table_dir=DEFAULT_TABLE_DIR):
+    build_tables(table_dir)
+    jobs = [(cube.state, max_length) for cube in cubes]
+    with Pool(processes, initializer=_init_worker, initargs=(table_dir,)) as pool:
+        return pool.map(_solve_state, jobs, chunksize=8)
@@ -0,0 +1,178 @@
+import os, sys, time, hashlib, argparse
+from multiprocessing import Pool, shared_memory
+import numpy as np
+from rcube_solver import TABLES, PRUNING, TABLE_SHA256, TABLE_VERSION, DEFAULT_TABLE_DIR, _save
+
+# --- Parallel solver-table builder ---
+# Rebuilds the rcube_solver tables with each BFS depth of a pruning table
+# split across a process pool:
+#     python rcube_tables.py --processes 8
+# The table being built lives in shared memory, packed two entries per byte
+# (15 marks unreached entries).  Every worker owns a byte-aligned range of
+# entries and only ever writes there, so no locking is needed:
+# - while the frontier is small, each worker expands the whole frontier and
+#   keeps the neighbours that land in its range ("push");
+# - once it is large, each worker checks the unreached entries of its range
+#   for a neighbour at the current depth ("pull"; the move set is closed
+#   under inverses, so this finds the same entries).
+# After every depth the packed table is checkpointed next to the output, and
+# an interrupted build resumes from the last finished depth.  Finished tables
+# are checked against rcube_solver.TABLE_SHA256.
+
+UNREACHED = 15
+BATCH = 1 << 16         # entries a worker expands at once in pull mode
+
+
+def _unpack(packed):
+    values = np.empty(2 * len(packed), dtype=np.uint8)
+    values[0::2] = packed & 15
+    values[1::2] = packed >> 4
+    return values
+
+
+def _pack(values):
+    return values[0::2] | (values[1::2] << 4)
+
+
+def _nibbles(packed, index):
+    return (packed[index >> 1] >> ((index & 1) << 2)) & 15
+
+
+# --- Worker side ---
+def _init_worker(shm_name, size, path, a, b):
+    global _shm, _packed, _size, _moves_a, _moves_b
+    _shm = shared_memory.SharedMemory(shm_name)
+    _packed = np.ndarray(((size + 1) // 2,), dtype=np.uint8, buffer=_shm.buf)
+    _size = size
+    _moves_a = np.load(os.path.join(path, a + '.npy')).astype(np.int64)
+    _moves_b = np.load(os.path.join(path, b + '.npy')).astype(np.int64)
+
+
+def _neighbours(index):
+    a, b = np.divmod(index, len(_moves_b))
+    return _moves_a[a] * len(_moves_b) + _moves_b[b]
+
+
+# Fill in depth + 1 for entries lo..hi (lo even); returns how many were set.
+def _expand(task):
+    lo, hi, depth, push = task
+    chunk = slice(lo >> 1, (hi + 1) >> 1)
+    full = _unpack(_packed[chunk])
+    values = full[:hi - lo]
+    if push:
+        frontier = np.flatnonzero(_unpack(_packed)[:_size] == depth)
+        nxt = _neighbours(frontier).ravel()
+        nxt = nxt[(nxt >= lo) & (nxt < hi)] - lo
+        values[nxt[values[nxt] == UNREACHED]] = depth + 1
+    else:
+        todo = np.flatnonzero(values == UNREACHED)
+        for start in range(0, len(todo), BATCH):
+            part = todo[start:start + BATCH]
+            near = _nibbles(_packed, _neighbours(part + lo)) == depth
+            values[part[near.any(axis=1)]] = depth + 1
+    _packed[chunk] = _pack(full)
+    return int(np.count_nonzero(values == depth + 1))
+
+
+# --- Builder ---
+def _save_checkpoint(file, packed, depth, filled, frontier):
+    tmp = file + '.tmp.npz'
+    np.savez(tmp, packed=packed, state=np.array([depth, filled, frontier]))
+    os.replace(tmp, file)
+
+
+# Breadth-first distances for one PRUNING entry, as rcube_solver stores them.
+def build_prune_table(path, name, processes=None, log=sys.stderr):
+    a, b, goal = PRUNING[name]
+    size = len(np.load(os.path.join(path, a + '.npy'), mmap_mode='r')) * \
+        len(np.load(os.path.join(path, b + '.npy'), mmap_mode='r'))
+    processes = processes or os.cpu_count()
+    checkpoint = os.path.join(path, name + '.partial.npz')
+    shm = shared_memory.SharedMemory(create=True, size=(size + 1) // 2)
+    try:
+        packed = np.ndarray(((size + 1) // 2,), dtype=np.uint8, buffer=shm.buf)
+        if os.path.exists(checkpoint):
+            with np.load(checkpoint) as saved:
+                packed[:] = saved['packed']
+                depth, filled, frontier = (int(v) for v in saved['state'])
+            print(f"{name}: resuming after depth {depth}", file=log)
+        else:
+            packed[:] = 0xff
+            packed[goal >> 1] &= 0xf0 if goal & 1 == 0 else 0x0f
+            depth, filled, frontier = 0, 1, 1
+        # Several ranges per process keeps the pool busy when ranges differ
+        # in work; ranges start on a byte boundary.
+        step = -(-size // (4 * processes))
+        step += step & 1
+        ranges = [(lo, min(lo + step, size)) for lo in range(0, size, step)]
+        with Pool(processes, initializer=_init_worker,
+                  initargs=(shm.name, size, path, a, b)) as pool:
+            while frontier and filled < size:
+                if depth + 1 >= UNREACHED:
+                    raise ValueError(f"{name} is deeper than {UNREACHED - 1} moves")
+                start = time.perf_counter()
+                push = frontier * len(ranges) < size - filled
+                tasks = [(lo, hi, depth, push) for lo, hi in ranges]
+                frontier = sum(pool.map(_expand, tasks))
+                depth += 1
+                filled += frontier
+                _save_checkpoint(checkpoint, packed, depth, filled, frontier)
+                print(f"{name}: depth {depth} +{frontier} ({filled / size:.1%}) "
+                      f"{'push' if push else 'pull'} {time.perf_counter() - start:.2f}s", file=log)
+        table = _unpack(packed)[:size]
+    finally:
+        shm.close()
+        shm.unlink()
+    table[table == UNREACHED] = 255
+    return table
+
+
+def _check(name, table, verify, log):
+    digest = hashlib.sha256(np.ascontiguousarray(table).tobytes()).hexdigest()
+    if digest == TABLE_SHA256.get(name):
+        return
+    if verify:
+        raise ValueError(f"{name}: checksum {digest} does not match TABLE_SHA256 "
+                         "(rebuild with --force, or --no-verify after changing coordinates)")
+    print(f"    {name!r}: {digest!r},", file=log)
+
+
+# Build every missing (or, with force, every) table under table_dir/v<N> and
+# check all of them against the reference checksums.
+def build(table_dir=DEFAULT_TABLE_DIR, processes=None, force=False, verify=True, log=sys.stderr):
+    path = os.path.join(table_dir, f'v{TABLE_VERSION}')
+    os.makedirs(path, exist_ok=True)
+    for name, make in TABLES.items():
+        file = os.path.join(path, name + '.npy')
+        if force or not os.path.exists(file):
+            _save(file, make().astype(np.uint16))
+        _check(name, np.load(file, mmap_mode='r'), verify, log)
+    for name in PRUNING:
+        file = os.path.join(path, name + '.npy')
+        if force or not os.path.exists(file):
+            start = time.perf_counter()
+            table = build_prune_table(path, name, processes, log)
+            _check(name, table, verify, log)
+            _save(file, table)
+            os.remove(os.path.join(path, name + '.partial.npz'))
+            print(f"{name}: done in {time.perf_counter() - start:.1f}s", file=log)
+        else:
+            _check(name, np.load(file, mmap_mode='r'), verify, log)
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the two-phase solver tables in parallel.")
+    parser.add_argument('--dir', default=DEFAULT_TABLE_DIR, help="table directory")
+    parser.add_argument('--processes', type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument('--force', action='store_true', help="rebuild tables that already exist")
+    parser.add_argument('--no-verify', action='store_true',
+                        help="print checksums that differ instead of failing")
+    args = parser.parse_args(argv)
+    start = time.perf_counter()
+    path = build(args.dir, args.processes, args.force, not args.no_verify)
+    print(f"tables in {path} ({time.perf_counter() - start:.1f}s)", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()